@@ -1,19 +1,37 @@
 import asyncio
+import hashlib
 import os
+import time
 import anyio
+from collections import OrderedDict
 from dotenv import load_dotenv
 load_dotenv()
  
 from google.adk.agents.llm_agent import Agent
-from google.adk.runners import InMemoryRunner
+from google.adk.runners import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory import InMemoryMemoryService
 from google.adk.models.lite_llm import LiteLlm
-from stream_adk import classify_adk_event
-from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from stream_adk import classify_event, StreamEvent, ResponseAccumulator, ConsoleSink
+from stream_adk import TEXT, TOOL_CALL, SECTION, DOCUMENT, ERROR, DONE
+from json_stream import JsonStreamParser, JsonStreamError, format_path, missing_keys
 from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
 from google.genai import types
 from prompts import PROMPT_1
+from mcp_pool import McpToolsetPool
+from mcp_manifest import CachedMcpToolset
+from session_store import SqliteSessionService
+from tool_memo import MemoizedToolset
+from llm_cache import CachedLlm, LLM_CACHE_ENABLED, prompt_cache_args
+from model_router import RoutedLlm
+from metrics import LLM_TTFT, AGENT_RUN
+from tracing import setup_tracing, shutdown_tracing, tracer
 # ---------------------------------------------------------
 #  LLM MODEL (LiteLLM backend)
 # ---------------------------------------------------------
@@ -24,11 +42,30 @@ LITELLM_API_BASE = os.getenv("LITELLM_API_BASE", "https://openrouter.ai/api/v1")
 model_1 = "openrouter/deepseek/deepseek-chat-v3-0324:free"
 model_2 = "openrouter/minimax/minimax-m2:free"
 
-model = LiteLlm(
-    model=model_2,
-    api_key=LITELLM_API_KEY,
-    api_base=LITELLM_API_BASE,
-)
+
+def make_llm(name: str) -> LiteLlm:
+    return LiteLlm(
+        model=name,
+        api_key=LITELLM_API_KEY,
+        api_base=LITELLM_API_BASE,
+        # let one turn request weather, stops, media ... together; the calls
+        # then run concurrently (bounded per turn by TOOL_MAX_CONCURRENCY, tool_memo.py)
+        parallel_tool_calls=True,
+        drop_params=True,
+        # a 429 fails over to the other model (model_router.py) instead of
+        # backing off inside the OpenAI client
+        max_retries=0,
+        # the static system prompt is billed / prefilled at the cached rate
+        **prompt_cache_args(),
+    )
+
+
+# each turn goes to the fastest healthy model, model_2 while there is no
+# data yet; errors and stalls fail over to the other (model_router.py)
+model = RoutedLlm([make_llm(model_2), make_llm(model_1)])
+if LLM_CACHE_ENABLED:
+    # identical trip requests replay the recorded answer (llm_cache.py)
+    model = CachedLlm(model)
  
  
 # ---------------------------------------------------------
@@ -44,12 +81,18 @@ MCP_SERVER_URL = "http://localhost:3001"
 #                     )
 #                 )
 #     )
-RoadTripToolset =  McpToolset(  #conectiunea cu serverul FastMCP prin HTTP (usor de de dockerizat ulterior)
+def make_roadtrip_toolset():
+    return CachedMcpToolset(  #conectiunea cu serverul FastMCP prin HTTP (usor de de dockerizat ulterior)
             connection_params=StreamableHTTPConnectionParams(
                 url="http://127.0.0.1:5003/mcp",
                 terminate_on_close=False
             ),
-        ) 
+        )
+
+# warm, health-checked sessions shared by every prompt (see mcp_pool.py)
+RoadTripToolset = McpToolsetPool(make_roadtrip_toolset)
+# repeated / concurrent identical calls within a session hit the server once
+MemoizedRoadTripToolset = MemoizedToolset(RoadTripToolset)
  
 # ---------------------------------------------------------
 #  Root RoadTrip Agent
@@ -60,29 +103,107 @@ root_agent = Agent(
     name="sentient_roadtrip_copilot",
     description="Emotion-aware, cinematic road-trip planning agent using MCP tools.",
     instruction=PROMPT_1,
-    tools=[RoadTripToolset],
+    tools=[MemoizedRoadTripToolset],
 )
  
 # ---------------------------------------------------------
 #  Runner & Session Manager
 # ---------------------------------------------------------
  
-runner = InMemoryRunner(agent=root_agent, app_name="roadtrip_app")
 APP_NAME = "roadtrip_app"
+
+# sqlite (default): durable, resumable from any worker, bounded memory.
+# memory: the old InMemoryRunner behaviour, handy for quick local runs.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+
+if SESSION_BACKEND == "sqlite":
+    session_service = SqliteSessionService()
+else:
+    session_service = InMemorySessionService()
+
+runner = Runner(
+    app_name=APP_NAME,
+    agent=root_agent,
+    session_service=session_service,
+    artifact_service=InMemoryArtifactService(),
+    memory_service=InMemoryMemoryService(),
+)
+
+
+async def startup():
+    """Open the MCP session pool once per process."""
+    setup_tracing("roadtrip-agent")
+    await RoadTripToolset.start()
+
+
+async def shutdown():
+    # closes every toolset of the agent, including the session pool
+    await runner.close()
+    shutdown_tracing()
  
  
-async def initialize_session(user_id: str):
-    try:
-        return await runner.session_service.create_session(
-            app_name=APP_NAME,
-            user_id=user_id
-        )
-    except:
-        # Fallback if session already exists
-        return await runner.session_service.create_session(
+# ---------------------------------------------------------
+#  Sessions: one per (user, trip), hot ones kept in an LRU
+# ---------------------------------------------------------
+# A follow-up like "add a waterfall stop on day 2" lands in the same
+# session as the original plan, so the model sees the earlier tool
+# results instead of planning from scratch.
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+HOT_SESSIONS_MAX = int(os.getenv("HOT_SESSIONS_MAX", "1024"))
+
+# (user_id, trip_id) -> (session_id, last_used)
+_hot_sessions = OrderedDict()
+
+
+async def _evict_hot_sessions():
+    now = time.monotonic()
+    while _hot_sessions:
+        (user_id, trip_id), (session_id, last_used) = next(iter(_hot_sessions.items()))
+        if len(_hot_sessions) <= HOT_SESSIONS_MAX and now - last_used < SESSION_IDLE_SECONDS:
+            break
+        del _hot_sessions[(user_id, trip_id)]
+        if SESSION_BACKEND != "sqlite":
+            # nothing durable behind an in-memory session: free it
+            await runner.session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id, session_id=session_id
+            )
+
+
+def trip_session_id(user_id: str, trip_id: str) -> str:
+    # unique per user as well: two users' "default" trips never share an id
+    user = hashlib.sha256(user_id.encode()).hexdigest()[:16]
+    return f"trip-{trip_id}-{user}"
+
+
+async def initialize_session(user_id: str, trip_id: str = "default"):
+    """Get-or-create the session of this user's trip; returns its id."""
+    key = (user_id, trip_id)
+    session_id = trip_session_id(user_id, trip_id)
+
+    if key not in _hot_sessions:
+        service = runner.session_service
+        session = await service.get_session(
             app_name=APP_NAME,
-            user_id=user_id
+            user_id=user_id,
+            session_id=session_id,
+            config=GetSessionConfig(num_recent_events=1),
         )
+        if session is None:
+            try:
+                await service.create_session(
+                    app_name=APP_NAME,
+                    user_id=user_id,
+                    session_id=session_id
+                )
+            except AlreadyExistsError:
+                # another worker created it between our get and create
+                pass
+
+    _hot_sessions[key] = (session_id, time.monotonic())
+    _hot_sessions.move_to_end(key)
+    await _evict_hot_sessions()
+    return session_id
  
 async def safe_stream_runner(runner, user_id, session_id, content):
     """
@@ -132,56 +253,162 @@ async def safe_stream(gen):
     finally:
         await safe_close(gen)
 
-async def run_roadtrip_prompt(prompt: str, user_id: str):
+# ---------------------------------------------------------
+#  Typed event stream (SSE endpoint in api.py)
+# ---------------------------------------------------------
+# The runner is drained by a producer task into a bounded queue: a slow
+# consumer makes the producer wait (backpressure) instead of buffering the
+# whole run, and closing the generator (client disconnect) cancels the run.
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+_STREAM_END = object()
+
+
+def _document_event(parser: JsonStreamParser, parse_error: str | None) -> StreamEvent:
+    """The answer as one JSON document, repaired if it was cut off."""
+    if parse_error is not None:
+        return StreamEvent(DOCUMENT, {"document": None, "error": parse_error})
+    document = parser.close()
+    if document is None:
+        return StreamEvent(DOCUMENT, {"document": None, "error": "no JSON object in the answer"})
+    return StreamEvent(DOCUMENT, {
+        "document": document,
+        "repaired": parser.repaired,
+        "missing": missing_keys(document),
+    })
+
+
+async def stream_roadtrip_prompt(
+    prompt: str,
+    user_id: str,
+    trip_id: str = "default",
+    queue_size: int = STREAM_QUEUE_SIZE,
+):
     """
-    Runs the Roadtrip MCP-powered ADK agent.
-    Includes:
-    - Session creation
-    - Streaming
-    - Auto retry on failure
-    - Strict JSON output
+    Yields StreamEvent records (stream_adk.py) as the agent produces them:
+      text         value, partial  token deltas, then the final text
+      tool_call    id, name, value=arguments
+      tool_result  id, name, value=response
+      section      name=path, value   each watched part of the JSON answer
+                   (itinerary day, stop, fuel ...) as soon as it closes
+      final / finish / error / ...  see stream_adk.classify_event
+      document     value={"document", "repaired", "missing"} or
+                   {"document": None, "error"}, once the run ends
+      done         value=session_id  always last, unless cancelled
     """
- 
-    session = await initialize_session(user_id)
-    print("Session:", session)
- 
+    session_id = await initialize_session(user_id, trip_id)
     content = types.Content(
         role="user",
         parts=[types.Part.from_text(text=prompt)]
     )
- 
-    response_text = ""
-    try:
-        async for event in safe_stream(
-            runner.run_async(
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        with tracer.start_as_current_span("roadtrip.prompt") as span:
+            span.set_attribute("roadtrip.user_id", user_id)
+            span.set_attribute("roadtrip.trip_id", trip_id)
+            span.set_attribute("roadtrip.session_id", session_id)
+            await run(span)
+
+    async def run(span):
+        t0 = time.perf_counter()
+        first_token = True
+        try:
+            # deltas of a response are streamed; its closing event repeats
+            # the whole text, which is only forwarded when nothing was
+            streamed = False
+            # the answer's JSON, parsed as it streams (json_stream.py)
+            parser = JsonStreamParser()
+            parse_error = None
+            async for event in runner.run_async(
                 user_id=user_id,
-                session_id=session.id,
-                new_message=content
-            )
-        ): 
+                session_id=session_id,
+                new_message=content,
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+            ):
+                for item in classify_event(event):
+                    if item.type == TEXT:
+                        if first_token:
+                            first_token = False
+                            LLM_TTFT.observe(time.perf_counter() - t0)
+                            span.add_event("first_token")
+                        if item.partial:
+                            streamed = True
+                        elif streamed:
+                            continue
+                        await queue.put(item)
+                        if parse_error is None:
+                            try:
+                                for path, value in parser.feed(item.value):
+                                    await queue.put(StreamEvent(SECTION, value, name=format_path(path)))
+                            except JsonStreamError as e:
+                                parse_error = str(e)
+                        continue
+                    if item.type == TOOL_CALL:
+                        # text ahead of a tool call is not the answer
+                        parser, parse_error = JsonStreamParser(), None
+                    await queue.put(item)
+                if not event.partial:
+                    streamed = False
+            AGENT_RUN.labels("ok").observe(time.perf_counter() - t0)
+            await queue.put(_document_event(parser, parse_error))
+            await queue.put(StreamEvent(DONE, session_id))
+        except Exception as e:
+            AGENT_RUN.labels("error").observe(time.perf_counter() - t0)
+            span.record_exception(e)
+            await queue.put(StreamEvent(ERROR, str(e)))
+        # not in a finally: once cancelled nobody reads the queue any more
+        await queue.put(_STREAM_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            yield item
+    finally:
+        # consumer gone (disconnect, aclose) or finished: stop the run
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
 
-            if event.partial and event.content and event.content.parts:
-                for part in event.content.parts:
-                    if getattr(part, "text", None):
-                        print(part.text, end="", flush=True)
-                        response_text += part.text
-            elif not event.partial and event.content and event.content.parts:
-                for part in event.content.parts:
-                    if getattr(part, "text", None):
-                        print(part.text, end="", flush=True)
-                        response_text += part.text
 
-            # if event and hasattr(event, "content") and event.content.parts:
-            #     part = event.content.parts[0]
-            #     if hasattr(part, "text") and part.text:
-            #         response_text += part.text
+async def run_roadtrip_prompt(
+    prompt: str,
+    user_id: str,
+    trip_id: str = "default",
+    echo: bool = True,
+):
+    """
+    Runs the Roadtrip MCP-powered ADK agent.
+    Includes:
+    - Session reuse per (user, trip)
+    - Streaming (echoed to the console at most every CONSOLE_FLUSH_INTERVAL)
+    - Auto retry on failure
+    - Strict JSON output
+    """
+ 
+    session_id = await initialize_session(user_id, trip_id)
+    print("Session:", session_id)
+
+    response = ResponseAccumulator(ConsoleSink() if echo else None)
+    try:
+        async for item in stream_roadtrip_prompt(prompt, user_id, trip_id):
+            if item.type == ERROR:
+                print("Stream error:", item.value)
+            response.add(item)
 
     except Exception as e:
         print("Roadtrip Session error, retrying:", e)
         raise e
-        
-    await RoadTripToolset.close()  
-    return response_text.strip()
+    finally:
+        text = response.close()
+
+    return text.strip()
  
 # async def run_roadtrip_prompt(prompt: str, user_id: str):
 
@@ -259,11 +486,16 @@ async def run_roadtrip_prompt(prompt: str, user_id: str):
 #     return final_output.strip()
 
 async def main():
-    out = await run_roadtrip_prompt(
-        "Plan a 2-day healing scenic road trip from Bangalore to Coorg. Mood = heartbreak.",
-        user_id="demo_user"
-    )
-    print(out)
+    await startup()
+    try:
+        out = await run_roadtrip_prompt(
+            "Plan a 2-day healing scenic road trip from Bangalore to Coorg. Mood = heartbreak.",
+            user_id="demo_user"
+        )
+        print(out)
+        print("Tool calls:", MemoizedRoadTripToolset.stats())
+    finally:
+        await shutdown()
  
  
 if __name__ == "__main__":
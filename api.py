@@ -0,0 +1,92 @@
+import json
+import os
+from contextlib import asynccontextmanager
+
+import uvicorn
+from pydantic import BaseModel
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from agent import startup, shutdown, stream_roadtrip_prompt
+from metrics import metrics_response
+from stream_adk import StreamEvent
+
+# -----------------------------------------------------
+#  HTTP front door for the agent (Server-Sent Events)
+# -----------------------------------------------------
+# POST /trips/{trip_id}/stream  {"prompt": "...", "user_id": "..."}
+# answers with text/event-stream, one SSE message per typed event:
+#
+#   event: tool_call
+#   data: {"type": "tool_call", "id": "...", "name": "plan_route", ...}
+#
+# so the frontend renders first tokens and tool progress as they happen.
+# When the client disconnects Starlette cancels the response, which closes
+# the generator and with it the agent run.
+
+API_PORT = int(os.getenv("API_PORT", "5004"))
+
+
+def _jsonable(value):
+    # grounding metadata & co. are pydantic models, finish reasons enums
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    return str(value)
+
+
+def sse(item: StreamEvent) -> str:
+    return f"event: {item.type}\ndata: {json.dumps(item.to_dict(), default=_jsonable)}\n\n"
+
+
+async def stream_trip(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    # a list or a string is valid JSON too
+    if not isinstance(body, dict) or not isinstance(body.get("prompt"), str):
+        return JSONResponse({"error": "expected a JSON body with a prompt"}, status_code=400)
+    prompt = body["prompt"]
+    user_id = body.get("user_id", "anonymous")
+    if not isinstance(user_id, str):
+        return JSONResponse({"error": "user_id must be a string"}, status_code=400)
+    trip_id = request.path_params["trip_id"]
+
+    async def events():
+        async for item in stream_roadtrip_prompt(prompt, user_id, trip_id):
+            yield sse(item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # no proxy buffering, or the first tokens sit in nginx
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def metrics(request: Request):
+    return metrics_response()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route("/trips/{trip_id}/stream", stream_trip, methods=["POST"]),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=API_PORT)
@@ -0,0 +1,124 @@
+"""
+Throughput and allocations of the ADK event classifier, replaying a
+recorded agent run (8 parallel tool calls, fuel, then ~300 streamed
+tokens of the final JSON):
+
+    hasattr async-gen   the previous classify_adk_event (hasattr probing,
+                        dict per item, one async generator per event)
+    classify_event      single pass, StreamEvent records
+    + to_dict           classify_event plus the wire dicts, as SSE sends
+
+    python -m benchmarks.event_classifier --rounds 200
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+from google.adk.events.event import Event
+
+from stream_adk import classify_event
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "adk_event_trace.jsonl")
+
+
+async def hasattr_classify(event):
+    if event and hasattr(event, "content") and event.content and event.content.parts:
+        for part in event.content.parts:
+            if hasattr(part, "text") and part.text and not getattr(part, "thought", False):
+                yield {"type": "text", "value": part.text, "partial": bool(event.partial)}
+    if event and hasattr(event, "get_function_calls"):
+        for call in event.get_function_calls():
+            yield {"type": "tool_call", "id": call.id, "name": call.name, "arguments": call.args}
+    if event and hasattr(event, "get_function_responses"):
+        for response in event.get_function_responses():
+            yield {"type": "tool_result", "id": response.id, "name": response.name, "response": response.response}
+    if event and hasattr(event, "grounding_metadata") and event.grounding_metadata:
+        yield {"type": "grounding", "value": event.grounding_metadata}
+    if event and hasattr(event, "branch") and event.branch:
+        yield {"type": "branch", "value": event.branch}
+    if event and hasattr(event, "finish_reason") and event.finish_reason:
+        yield {"type": "finish", "reason": event.finish_reason}
+    if event and hasattr(event, "is_final_response") and event.is_final_response():
+        yield {"type": "final"}
+    if event and hasattr(event, "interrupted") and event.interrupted:
+        yield {"type": "interrupted"}
+    if event and hasattr(event, "error_code") and event.error_code:
+        yield {"type": "error", "error_code": event.error_code, "error_message": event.error_message}
+    if event and hasattr(event, "custom_metadata") and event.custom_metadata:
+        yield {"type": "custom", "value": event.custom_metadata}
+
+
+async def run_hasattr(events, keep):
+    for event in events:
+        async for item in hasattr_classify(event):
+            keep.append(item)
+
+
+async def run_classify(events, keep):
+    for event in events:
+        keep.extend(classify_event(event))
+
+
+async def run_to_dict(events, keep):
+    for event in events:
+        for item in classify_event(event):
+            keep.append(item.to_dict())
+
+
+VARIANTS = {
+    "hasattr async-gen": run_hasattr,
+    "classify_event": run_classify,
+    "+ to_dict": run_to_dict,
+}
+
+
+def load_trace() -> list[Event]:
+    with open(FIXTURE) as f:
+        return [Event.model_validate_json(line) for line in f if line.strip()]
+
+
+async def measure(run, events, rounds: int) -> dict:
+    # throughput: outputs dropped right away, as a streaming consumer would
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        await run(events, [])
+    elapsed = time.perf_counter() - t0
+
+    # allocations: one replay under tracemalloc, outputs kept alive
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await run(events, keep)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in diff if stat.count_diff > 0)
+
+    return {
+        "events_per_sec": rounds * len(events) / elapsed,
+        "blocks_per_event": blocks / len(events),
+        "peak_bytes_per_event": peak / len(events),
+        "items": len(keep),
+    }
+
+
+async def main(args):
+    events = load_trace()
+    partial = sum(1 for e in events if e.partial)
+    print(f"trace: {len(events)} events ({partial} partial), {args.rounds} rounds")
+    for name, run in VARIANTS.items():
+        r = await measure(run, events, args.rounds)
+        print(
+            f"{name:<18} {r['events_per_sec']:>10,.0f} events/s  "
+            f"{r['blocks_per_event']:6.1f} blocks/event  "
+            f"{r['peak_bytes_per_event']:7.0f} peak B/event  items={r['items']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
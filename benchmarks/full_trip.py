@@ -0,0 +1,117 @@
+"""
+Model turns, tokens and wall time for one full trip plan:
+
+    sequential  one tool call per model turn (the original PROMPT_1 flow)
+    parallel    independent calls batched into one turn, then fuel
+    composite   a single plan_full_trip call
+
+Tools run for real against the stub upstream; the model is simulated with
+a fixed latency per turn. Every turn re-sends the system prompt and the
+whole conversation so far, which is where the extra turns cost tokens.
+
+    python -m benchmarks.full_trip --llm-ms 1500 --latency-ms 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+from fastmcp import Client
+
+import server
+from cache import CACHES
+from benchmarks.payload_size import token_counter
+from upstream import point_upstreams_at
+from prompts import PROMPT_1
+
+USER_PROMPT = "Plan a 2-day healing scenic road trip from Bangalore to Coorg. Mood = heartbreak."
+TRIP = {"origin": "Bangalore", "destination": "Coorg", "mood": "heartbreak", "days": 2}
+OD = {"origin": "Bangalore", "destination": "Coorg"}
+
+# independent of the route; fuel comes after plan_route
+FAN_OUT = [
+    ("analyze_roadtrip_mood", {"mood": "heartbreak"}),
+    ("plan_route", OD),
+    ("find_stops_along_route", {**OD, "kind": "scenic"}),
+    ("find_stops_along_route", {**OD, "kind": "food"}),
+    ("get_weather_along_route", OD),
+    ("generate_trip_media", {"destination": "Coorg", "style": "cinematic"}),
+    ("generate_roadtrip_itinerary", {"destination": "Coorg", "days": 2}),
+    ("enhance_destination_context", {"destination": "Coorg"}),
+]
+FUEL = ("estimate_fuel_cost", {"distance_km": 265})
+
+FLOWS = {
+    "sequential": [[call] for call in FAN_OUT] + [[FUEL]],
+    "parallel": [FAN_OUT, [FUEL]],
+    "composite": [[("plan_full_trip", TRIP)]],
+}
+
+
+async def run_flow(client, turns, llm_s: float, answer_tokens: int, count) -> dict:
+    context = count(PROMPT_1) + count(USER_PROMPT)
+    input_tokens = output_tokens = 0
+    wall = 0.0
+
+    for calls in turns:
+        # the model turn that requests these calls
+        input_tokens += context
+        requested = sum(count(json.dumps({"name": n, "args": {"input": a}})) for n, a in calls)
+        output_tokens += requested
+        context += requested
+        wall += llm_s
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(client.call_tool(n, {"input": a}) for n, a in calls))
+        wall += time.perf_counter() - t0
+        context += sum(count(json.dumps(r.structured_content)) for r in results)
+
+    # the final narration turn
+    input_tokens += context
+    output_tokens += answer_tokens
+    wall += llm_s
+
+    return {
+        "model_turns": len(turns) + 1,
+        "tool_calls": sum(len(calls) for calls in turns),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "wall_s": wall,
+    }
+
+
+async def main(args):
+    encoding, count = token_counter()
+    print(f"tokens: {encoding}  simulated llm turn: {args.llm_ms:.0f}ms")
+    async with Client(server.app) as client:
+        for name, turns in FLOWS.items():
+            # cold caches for every flow
+            for cache in CACHES.values():
+                cache.clear()
+            r = await run_flow(client, turns, args.llm_ms / 1000, args.answer_tokens, count)
+            print(
+                f"{name:<11} turns={r['model_turns']:>3}  tool_calls={r['tool_calls']:>2}  "
+                f"input_tokens={r['input_tokens']:>7}  output_tokens={r['output_tokens']:>5}  "
+                f"wall={r['wall_s']:6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    from benchmarks.stub_upstream import start_in_background
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-ms", type=float, default=1500)
+    parser.add_argument("--answer-tokens", type=int, default=600)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    stub = start_in_background(args.port, args.latency_ms)
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    try:
+        asyncio.run(main(args))
+    finally:
+        stub.terminate()
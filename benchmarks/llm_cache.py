@@ -0,0 +1,161 @@
+"""
+Time to first token and cost per LLM call, with and without the response
+cache and provider prompt-prefix caching (llm_cache.py), against the stub
+chat completions endpoint (benchmarks/stub_llm.py):
+
+    python -m benchmarks.llm_cache --requests 20 --distinct 5
+
+Every call is what the agent sends on its first turn: PROMPT_1 as the
+system instruction, the MCP tool schemas, one trip request. --distinct
+different trip requests are cycled through --requests times, so every
+request after the first --distinct is a repeat.
+
+  uncached         plain LiteLlm: the whole prompt is prefilled and billed
+                   every time
+  prefix cache     cache_control on the system prompt: after the first call
+                   the prefix is read from the provider cache
+  response cache   prefix cache + CachedLlm: repeats are answered without
+                   a call (the stub's prefix cache is still warm from the
+                   mode before)
+
+Per mode, split by what actually happened to the call: p50 / p99 TTFT,
+prompt and cached prompt tokens, and USD per call at --price-model rates
+(LiteLLM's price table; the free OpenRouter models are not in it).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+# the price table ships with litellm; don't try to fetch a newer one
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from fastmcp import Client
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.tools._gemini_schema_util import _to_gemini_schema
+from google.genai import types
+
+import server
+from benchmarks.stub_llm import start_in_background
+from benchmarks.tool_latency import percentile
+from cache import LRUCache
+from llm_cache import CachedLlm, PromptCachingClient, llm_cost
+from prompts import PROMPT_1
+
+TRIPS = [
+    ("Bangalore", "Coorg", "heartbreak"),
+    ("Mumbai", "Goa", "celebration"),
+    ("Delhi", "Rishikesh", "burnout"),
+    ("Chennai", "Pondicherry", "nostalgia"),
+    ("Pune", "Lonavala", "adventure"),
+    ("Kochi", "Munnar", "romance"),
+    ("Hyderabad", "Hampi", "curiosity"),
+    ("Jaipur", "Udaipur", "wanderlust"),
+]
+
+
+async def tool_declarations() -> list:
+    async with Client(server.app) as client:
+        tools = await client.list_tools()
+    return [
+        types.FunctionDeclaration(
+            name=t.name, description=t.description, parameters=_to_gemini_schema(t.inputSchema),
+        )
+        for t in tools
+    ]
+
+
+def trip_request(i: int, distinct: int, declarations: list) -> LlmRequest:
+    origin, destination, mood = TRIPS[i % distinct]
+    # repeats differ in case and spacing only, as users type them
+    text = f"Plan a road trip from {origin} to {destination}, I'm feeling {mood}."
+    if i >= distinct:
+        text = "  " + text.lower()
+    return LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part(text=text)])],
+        config=types.GenerateContentConfig(
+            system_instruction=PROMPT_1,
+            tools=[types.Tool(function_declarations=declarations)],
+        ),
+    )
+
+
+async def run_mode(mode: str, declarations: list, args) -> dict:
+    kwargs = {"llm_client": PromptCachingClient()} if mode != "uncached" else {}
+    llm = LiteLlm(
+        model=args.price_model, api_key="stub", api_base=f"http://127.0.0.1:{args.port}/v1", **kwargs,
+    )
+    if mode == "response cache":
+        llm = CachedLlm(llm, cache=LRUCache(maxsize=512, ttl=3600))
+
+    # what happened to each call -> [(ttft, prompt tokens, cached tokens, usd)]
+    calls = {}
+    for i in range(args.requests):
+        request = trip_request(i, args.distinct, declarations)
+        t0 = time.perf_counter()
+        ttft = None
+        usage = None
+        hit = False
+        async for response in llm.generate_content_async(request, stream=True):
+            if ttft is None and response.content and response.content.parts:
+                ttft = time.perf_counter() - t0
+            usage = response.usage_metadata or usage
+            hit = hit or (response.custom_metadata or {}).get("llm_cache") == "hit"
+        if hit:
+            kind = "response cache hit"
+        elif usage and usage.cached_content_token_count:
+            kind = "prefix cache hit"
+        else:
+            kind = "uncached"
+        calls.setdefault(kind, []).append((
+            ttft,
+            usage.prompt_token_count if usage else 0,
+            (usage.cached_content_token_count or 0) if usage else 0,
+            llm_cost(args.price_model, usage) if usage else 0.0,
+        ))
+    return calls
+
+
+def report(mode: str, calls: dict):
+    print(mode)
+    for kind, rows in calls.items():
+        ttfts = sorted(r[0] for r in rows)
+        n = len(rows)
+        print(
+            f"  {kind:<19} calls={n:>3}  ttft p50={percentile(ttfts, 0.5) * 1000:7.1f}ms  "
+            f"p99={percentile(ttfts, 0.99) * 1000:7.1f}ms  "
+            f"prompt={sum(r[1] for r in rows) / n:6.0f} tok  cached={sum(r[2] for r in rows) / n:6.0f} tok  "
+            f"${sum(r[3] for r in rows) / n:.6f}/call"
+        )
+    total = sum(len(rows) for rows in calls.values())
+    spend = sum(r[3] for rows in calls.values() for r in rows)
+    print(f"  total ${spend:.6f} for {total} requests")
+
+
+def main(args):
+    stub = start_in_background(
+        args.port, base_ms=args.base_ms, prefill_tok_s=args.prefill_tok_s,
+        decode_tok_s=args.decode_tok_s, answer_tokens=args.answer_tokens,
+    )
+    try:
+        declarations = asyncio.run(tool_declarations())
+        for mode in args.modes:
+            report(mode, asyncio.run(run_mode(mode, declarations, args)))
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=5, help=f"different trip requests (<= {len(TRIPS)})")
+    parser.add_argument("--modes", nargs="+", default=["uncached", "prefix cache", "response cache"])
+    parser.add_argument("--price-model", default="openai/gpt-4o-mini")
+    parser.add_argument("--base-ms", type=float, default=150, help="stub LLM fixed time to first token")
+    parser.add_argument("--prefill-tok-s", type=float, default=5000)
+    parser.add_argument("--decode-tok-s", type=float, default=50)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--port", type=int, default=5098)
+    main(parser.parse_args())
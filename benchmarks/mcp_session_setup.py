@@ -0,0 +1,114 @@
+"""
+Per-request MCP setup cost: a fresh McpToolset per prompt (initialize +
+tools/list + close, as run_roadtrip_prompt used to do) vs. the warm
+McpToolsetPool that stays open for the life of the process, and a cold
+CachedMcpToolset that gets its tool list from the on-disk manifest.
+
+"tools" is the time until the tool declarations are ready, i.e. until
+the first LLM call can go out; "first result" adds the first tool call.
+
+Starts server.py's FastMCP app over streamable HTTP on a local port and
+calls analyze_roadtrip_mood (no upstream involved) once per "request".
+
+    python -m benchmarks.mcp_session_setup --requests 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+import httpx
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+
+from mcp_manifest import CachedMcpToolset
+from mcp_pool import McpToolsetPool
+
+ARGS = {"input": {"mood": "heartbreak"}}
+
+
+def serve_mcp(port: int):
+    import server
+    asyncio.run(server.app.run_async(transport="http", port=port, log_level="warning", show_banner=False))
+
+
+def start_mcp_server(port: int) -> multiprocessing.Process:
+    proc = multiprocessing.Process(target=serve_mcp, args=(port,), daemon=True)
+    proc.start()
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/mcp", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("MCP server did not start")
+
+
+async def call_first_tool(toolset, timings: dict):
+    """Time from 'prompt arrives' to the tool list, then to the first tool result."""
+    t0 = time.perf_counter()
+    tools = await toolset.get_tools()
+    timings["tools"].append(time.perf_counter() - t0)
+    tool = next(t for t in tools if t.name == "analyze_roadtrip_mood")
+    session = await tool._mcp_session_manager.create_session()
+    await session.call_tool(tool.name, arguments=ARGS)
+    timings["first result"].append(time.perf_counter() - t0)
+
+
+async def cold(toolset_cls, url: str, n: int) -> dict:
+    timings = {"tools": [], "first result": []}
+    for _ in range(n):
+        toolset = toolset_cls(connection_params=StreamableHTTPConnectionParams(url=url, terminate_on_close=False))
+        await call_first_tool(toolset, timings)
+        await toolset.close()
+    return timings
+
+
+async def warm(url: str, n: int) -> dict:
+    timings = {"tools": [], "first result": []}
+    pool = McpToolsetPool(lambda: McpToolset(
+        connection_params=StreamableHTTPConnectionParams(url=url, terminate_on_close=False)
+    ))
+    await pool.start()
+    try:
+        for _ in range(n):
+            await call_first_tool(pool, timings)
+    finally:
+        await pool.close()
+    return timings
+
+
+def report(label: str, timings: dict):
+    for stage, values in timings.items():
+        ms = sorted(t * 1000 for t in values)
+        print(
+            f"{label:<28} {stage:<13} mean={statistics.mean(ms):7.2f}ms  "
+            f"p50={statistics.median(ms):7.2f}ms  p95={ms[int(len(ms) * 0.95) - 1]:7.2f}ms"
+        )
+
+
+async def main(args):
+    url = f"http://127.0.0.1:{args.port}/mcp"
+    await cold(CachedMcpToolset, url, 1)  # make sure the manifest is on disk
+    report("close-per-request", await cold(McpToolset, url, args.requests))
+    report("cold + cached manifest", await cold(CachedMcpToolset, url, args.requests))
+    report("warm pool", await warm(url, args.requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--port", type=int, default=5013)
+    args = parser.parse_args()
+
+    srv = start_mcp_server(args.port)
+    try:
+        asyncio.run(main(args))
+    finally:
+        srv.terminate()
@@ -0,0 +1,161 @@
+"""
+Model routing under injected LLM faults: the same paced load of streamed
+model calls through four phases of two stub LLMs (benchmarks/stub_llm.py)
+standing in for model_2 (minimax, the agent's old hard-wired model) and
+model_1 (deepseek):
+
+    python -m benchmarks.model_routing --phase-s 10 --concurrency 4
+
+  healthy   minimax answers faster (--fast-ms) than deepseek (--slow-ms)
+  429s      every minimax call is rate limited
+  stalls    --stall-rate of minimax calls hold their first token for
+            --stall-s, past the router's first-token timeout
+  recovery  healthy again
+
+Modes: "fixed" (minimax only, as before), "router" (RoutedLlm over both)
+and "race" (RoutedLlm racing both for the first token). Per phase: calls,
+failed calls, p50 / p99 time to first token as the caller sees it
+(failovers included) and the share answered by each model.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+_parser = argparse.ArgumentParser()
+_parser.add_argument("--phase-s", type=float, default=10)
+_parser.add_argument("--concurrency", type=int, default=4)
+_parser.add_argument("--rate", type=float, default=4, help="offered calls/s, same in every phase")
+_parser.add_argument("--fast-ms", type=float, default=300)
+_parser.add_argument("--slow-ms", type=float, default=700)
+_parser.add_argument("--stall-rate", type=float, default=0.3)
+_parser.add_argument("--stall-s", type=float, default=8)
+_parser.add_argument("--first-token-timeout-s", type=float, default=2)
+_parser.add_argument("--breaker-open-s", type=float, default=5)
+_parser.add_argument("--error-half-life-s", type=float, default=3)
+_parser.add_argument("--ports", type=int, nargs=2, default=[5096, 5097])
+_parser.add_argument("--modes", nargs="+", default=["fixed", "router", "race"])
+
+if __name__ == "__main__":
+    # read at import time by model_router.py
+    _args = _parser.parse_args()
+    os.environ["MODEL_BREAKER_OPEN_SECONDS"] = str(_args.breaker_open_s)
+    os.environ["MODEL_ERROR_HALF_LIFE"] = str(_args.error_half_life_s)
+
+import litellm
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from benchmarks.stub_llm import set_faults, start_in_background
+from benchmarks.tool_latency import percentile
+from model_router import RoutedLlm
+from prompts import PROMPT_1
+
+litellm.suppress_debug_info = True
+
+MINIMAX, DEEPSEEK = "openai/minimax-m2", "openai/deepseek-chat"
+HEALTHY = {"error_rate": 0.0, "stall_rate": 0.0}
+
+
+def phases(args) -> list:
+    return [
+        ("healthy", HEALTHY),
+        ("429s", {"error_rate": 1.0, "stall_rate": 0.0}),
+        ("stalls", {"error_rate": 0.0, "stall_rate": args.stall_rate}),
+        ("recovery", HEALTHY),
+    ]
+
+
+def request() -> LlmRequest:
+    return LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part(text="Plan a road trip from Bangalore to Coorg")])],
+        config=types.GenerateContentConfig(system_instruction=PROMPT_1),
+    )
+
+
+def make_llm(mode: str, args):
+    minimax, deepseek = (
+        LiteLlm(model=name, api_key="stub", api_base=f"http://127.0.0.1:{port}/v1", max_retries=0)
+        for name, port in zip((MINIMAX, DEEPSEEK), args.ports)
+    )
+    if mode == "fixed":
+        return minimax
+    return RoutedLlm(
+        [minimax, deepseek], race=mode == "race", first_token_timeout=args.first_token_timeout_s,
+        explore_ratio=0.05,
+    )
+
+
+async def run_phase(llm, args) -> dict:
+    ttfts = []
+    failed = 0
+    answered = {}
+    deadline = time.monotonic() + args.phase_s
+    pace = args.concurrency / args.rate
+
+    async def worker():
+        nonlocal failed
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            ttft = None
+            model = None
+            try:
+                async for response in llm.generate_content_async(request(), stream=True):
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    model = (response.custom_metadata or {}).get("model", llm.model)
+            except Exception:
+                failed += 1
+            else:
+                ttfts.append(ttft)
+                answered[model] = answered.get(model, 0) + 1
+            await asyncio.sleep(max(0.0, pace - (time.perf_counter() - t0)))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    ttfts.sort()
+    return {
+        "calls": len(ttfts) + failed,
+        "failed": failed,
+        "p50_ms": percentile(ttfts, 0.5) * 1000,
+        "p99_ms": percentile(ttfts, 0.99) * 1000,
+        "answered": answered,
+    }
+
+
+async def run_mode(mode: str, args):
+    llm = make_llm(mode, args)
+    print(mode)
+    for phase, faults in phases(args):
+        set_faults(args.ports[0], **faults)
+        r = await run_phase(llm, args)
+        share = "  ".join(
+            f"{name.split('/')[-1]}={n / max(r['calls'] - r['failed'], 1):.0%}"
+            for name, n in sorted(r["answered"].items())
+        )
+        print(
+            f"  {phase:<9} calls={r['calls']:>4}  failed={r['failed']:>4}  "
+            f"ttft p50={r['p50_ms']:7.1f}ms  p99={r['p99_ms']:7.1f}ms  {share}"
+        )
+    if isinstance(llm, RoutedLlm):
+        print(f"  {llm.stats()}")
+
+
+def main(args):
+    stubs = [
+        start_in_background(args.ports[0], base_ms=args.fast_ms, stall_s=args.stall_s, answer_tokens=10),
+        start_in_background(args.ports[1], base_ms=args.slow_ms, answer_tokens=10),
+    ]
+    try:
+        for mode in args.modes:
+            asyncio.run(run_mode(mode, args))
+    finally:
+        for stub in stubs:
+            stub.terminate()
+
+
+if __name__ == "__main__":
+    main(_args)
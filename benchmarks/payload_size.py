@@ -0,0 +1,49 @@
+"""
+Bytes and tokens a Places tool result adds to the LLM context, raw vs.
+the slim projection returned by default.
+
+    python -m benchmarks.payload_size
+"""
+import json
+import os
+
+from places import slim_places
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "places_nearby.json")
+
+
+def token_counter():
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        return "cl100k_base", lambda text: len(enc.encode(text))
+    except Exception:
+        # offline: ~4 characters per token is close for JSON-heavy text
+        return "approx chars/4", lambda text: len(text) // 4
+
+
+def main():
+    with open(FIXTURE) as f:
+        raw = json.load(f)
+    lat, lng = 12.42, 75.74
+
+    encoding, count = token_counter()
+    rows = [("raw", raw)]
+    for k in (20, 8, 5):
+        rows.append((f"slim top_k={k}", slim_places(raw, lat, lng, 8000, k)))
+
+    print(f"tokens: {encoding}")
+    base_bytes = base_tokens = None
+    for label, payload in rows:
+        text = json.dumps(payload)
+        n_bytes, n_tokens = len(text.encode()), count(text)
+        base_bytes = base_bytes or n_bytes
+        base_tokens = base_tokens or n_tokens
+        print(
+            f"{label:<16} bytes={n_bytes:>7}  tokens={n_tokens:>6}  "
+            f"({n_bytes / base_bytes:6.1%} bytes, {n_tokens / base_tokens:6.1%} tokens)"
+        )
+
+
+if __name__ == "__main__":
+    main()
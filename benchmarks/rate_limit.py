@@ -0,0 +1,118 @@
+"""
+Throughput at a QPS quota: Directions requests against the stub upstream
+enforcing --quota requests/s (429 + Retry-After above it), with and
+without the client-side rate limiter.
+
+    python -m benchmarks.rate_limit --quota 40 --duration 10
+
+Two kinds of load at once:
+  interactive  --interactive-share of the quota, arriving at a steady
+               rate (user prompts)
+  background   --background-workers requests back to back at background
+               priority (as plan_full_trip's optional media branch), i.e.
+               everything the quota has left and more
+
+Per mode and priority: answers per second, failed requests, p50 / p99
+(queueing included), plus the 429s the stub handed out. Without the
+limiter the 429s are retried by the resilience layer until its budget
+runs dry and its breaker opens. Run with CACHE_BACKEND=memory or
+RATE_LIMIT_BACKEND=sqlite to measure either bucket backend.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+from benchmarks.stub_upstream import start_in_background, stub_stats
+from benchmarks.tool_latency import percentile
+from ratelimit import BACKGROUND, INTERACTIVE, PRIORITY_NAMES, background, reset_rate_limits
+from resilience import UpstreamError, policy
+from upstream import UPSTREAMS, close_client, get_json, point_upstreams_at
+
+DIRECTIONS = "/maps/api/directions/json"
+PARAMS = {"origin": "Bangalore", "destination": "Coorg"}
+
+
+async def run_mode(qps: float, args) -> dict:
+    UPSTREAMS["maps"]["qps"] = qps
+    reset_rate_limits()
+    policy.reset()
+    latencies = {INTERACTIVE: [], BACKGROUND: []}
+    failed = {INTERACTIVE: 0, BACKGROUND: 0}
+    deadline = time.monotonic() + args.duration
+
+    async def request(priority: int):
+        t0 = time.perf_counter()
+        try:
+            await get_json("maps", DIRECTIONS, PARAMS)
+        except UpstreamError:
+            failed[priority] += 1
+            return False
+        latencies[priority].append(time.perf_counter() - t0)
+        return True
+
+    async def interactive():
+        rate = args.quota * args.interactive_share
+        calls = []
+        while time.monotonic() < deadline:
+            calls.append(asyncio.ensure_future(request(INTERACTIVE)))
+            await asyncio.sleep(1 / rate)
+        await asyncio.gather(*calls)
+
+    async def background_worker():
+        with background():
+            while time.monotonic() < deadline:
+                if not await request(BACKGROUND):
+                    # an open breaker fails without awaiting anything
+                    await asyncio.sleep(0.1)
+
+    before = stub_stats(args.port)
+    await asyncio.gather(interactive(), *(background_worker() for _ in range(args.background_workers)))
+    after = stub_stats(args.port)
+    await close_client()
+    out = {"rejected_429": after["rejected_429"] - before["rejected_429"]}
+    for priority, values in latencies.items():
+        values.sort()
+        out[PRIORITY_NAMES[priority]] = {
+            "ok_per_s": len(values) / args.duration,
+            "failed": failed[priority],
+            "p50_ms": percentile(values, 0.5) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return out
+
+
+def main(args):
+    stub = start_in_background(args.port, args.latency_ms, qps_limit=args.quota)
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    modes = [
+        ("no limiter", 0),
+        (f"limiter {args.quota * args.headroom:g}/s", args.quota * args.headroom),
+    ]
+    try:
+        for label, qps in modes:
+            r = asyncio.run(run_mode(qps, args))
+            print(f"{label}  (429s from the upstream: {r['rejected_429']})")
+            for priority in PRIORITY_NAMES.values():
+                p = r[priority]
+                print(
+                    f"  {priority:<12} ok={p['ok_per_s']:6.1f}/s  failed={p['failed']:>5}  "
+                    f"p50={p['p50_ms']:7.1f}ms  p99={p['p99_ms']:7.1f}ms"
+                )
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quota", type=float, default=40, help="stub QPS limit")
+    # the bucket's burst (RATE_LIMIT_BURST_SECONDS) rides on top of the rate
+    parser.add_argument("--headroom", type=float, default=0.8, help="limiter rate as a share of the quota")
+    parser.add_argument("--interactive-share", type=float, default=0.5)
+    parser.add_argument("--background-workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=5099)
+    main(parser.parse_args())
@@ -0,0 +1,162 @@
+"""
+Upstream resilience under injected faults: the same load of plan_route /
+get_weather_on_route calls through four phases of the stub upstream,
+once with the resilience layer on and once with UPSTREAM_RESILIENCE=off
+behaviour (every request sent exactly once).
+
+    python -m benchmarks.resilience_faults --phase-s 10 --concurrency 16
+
+  healthy   --latency-ms, mild jitter
+  brownout  heavy latency tail, 15% 503s, 3% requests that hang past the
+            upstream timeout
+  outage    every request fails
+  recovery  healthy again
+
+The load is paced at --rate calls/s, so failing fast does not simply mean
+more calls. Per phase: calls, answers served fresh / stale / as errors, p50 / p99
+tool latency (and p99 of the hedged weather calls) and how many requests actually reached the upstream. The
+route cache TTL is short (--route-ttl) so the outage has expired entries
+to fall back on, the breaker re-probes after --breaker-open-s, and the
+upstream timeout is cut to --upstream-timeout-s to keep phases short.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+_parser = argparse.ArgumentParser()
+_parser.add_argument("--phase-s", type=float, default=10)
+_parser.add_argument("--concurrency", type=int, default=16)
+_parser.add_argument("--rate", type=float, default=150, help="offered calls/s, same in every phase")
+_parser.add_argument("--latency-ms", type=float, default=50)
+_parser.add_argument("--routes", type=int, default=20, help="distinct origin/destination pairs")
+_parser.add_argument("--route-ttl", type=float, default=5)
+_parser.add_argument("--breaker-open-s", type=float, default=3)
+_parser.add_argument("--upstream-timeout-s", type=float, default=1.0)
+_parser.add_argument("--port", type=int, default=5099)
+_parser.add_argument("--modes", nargs="+", default=["on", "off"])
+
+if __name__ == "__main__":
+    # read at import time by server.py / resilience.py
+    _args = _parser.parse_args()
+    os.environ["ROUTE_CACHE_TTL"] = str(_args.route_ttl)
+    os.environ["BREAKER_OPEN_SECONDS"] = str(_args.breaker_open_s)
+
+import httpx
+from fastmcp import Client
+
+import server
+from benchmarks.stub_upstream import set_faults, start_in_background, stub_requests
+from benchmarks.tool_latency import is_error, percentile
+from cache import CACHES
+from resilience import policy
+from upstream import UPSTREAMS, point_upstreams_at
+
+_stdout = sys.stdout
+
+HEALTHY = {"latency_sigma": 0.3, "error_rate": 0.0, "timeout_rate": 0.0}
+PHASES = [
+    ("healthy", HEALTHY),
+    ("brownout", {"latency_sigma": 1.2, "error_rate": 0.15, "timeout_rate": 0.03}),
+    ("outage", {"latency_sigma": 0.3, "error_rate": 1.0, "timeout_rate": 0.0}),
+    ("recovery", HEALTHY),
+]
+
+
+def report(line: str):
+    # stdout itself is silenced: tool bodies print progress lines
+    print(line, file=_stdout, flush=True)
+
+
+async def run_phase(client: Client, args, routes: list, rng: random.Random) -> dict:
+    latencies = []
+    weather = []
+    counts = {"ok": 0, "stale": 0, "error": 0}
+    deadline = time.monotonic() + args.phase_s
+    pace = args.concurrency / args.rate
+
+    async def worker():
+        while time.monotonic() < deadline:
+            if rng.random() < 0.5:
+                name, tool_args = "plan_route", rng.choice(routes)
+            else:
+                name, tool_args = "get_weather_on_route", {"lat": 12.97, "lng": 77.59}
+            t0 = time.perf_counter()
+            try:
+                result = await client.call_tool(name, {"input": tool_args}, raise_on_error=False)
+            except Exception:
+                outcome = "error"
+            else:
+                structured = result.structured_content
+                if is_error(result):
+                    outcome = "error"
+                elif isinstance(structured, dict) and structured.get("stale"):
+                    outcome = "stale"
+                else:
+                    outcome = "ok"
+            counts[outcome] += 1
+            elapsed = time.perf_counter() - t0
+            latencies.append(elapsed)
+            if name == "get_weather_on_route":
+                weather.append(elapsed)
+            await asyncio.sleep(max(0.0, pace - elapsed))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    latencies.sort()
+    weather.sort()
+    return {
+        **counts,
+        "calls": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        # the hedged upstream
+        "weather_p99_ms": percentile(weather, 0.99) * 1000,
+    }
+
+
+async def run_mode(mode: str, args) -> None:
+    policy.reset(enabled=mode == "on")
+    for cache in CACHES.values():
+        cache.clear()
+    routes = [{"origin": f"Town {i}", "destination": "Coorg"} for i in range(args.routes)]
+    rng = random.Random(0)
+
+    report(f"resilience {mode}")
+    async with Client(server.app) as client:
+        for phase, faults in PHASES:
+            set_faults(args.port, **faults)
+            before = stub_requests(args.port)
+            r = await run_phase(client, args, routes, rng)
+            upstream = stub_requests(args.port) - before
+            report(
+                f"  {phase:<9} calls={r['calls']:>5}  ok={r['ok']:>5}  stale={r['stale']:>4}  "
+                f"errors={r['error']:>4}  p50={r['p50_ms']:7.1f}ms  p99={r['p99_ms']:7.1f}ms  "
+                f"weather p99={r['weather_p99_ms']:7.1f}ms  "
+                f"upstream={upstream:>5} ({upstream / max(r['calls'], 1):.2f}/call)"
+            )
+    if mode == "on":
+        report(f"  {policy.stats()}")
+
+
+def main(args):
+    stub = start_in_background(
+        args.port, args.latency_ms, timeout_s=args.upstream_timeout_s * 3, **HEALTHY,
+    )
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    for conf in UPSTREAMS.values():
+        conf["timeout"] = httpx.Timeout(args.upstream_timeout_s)
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            for mode in args.modes:
+                asyncio.run(run_mode(mode, args))
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main(_args)
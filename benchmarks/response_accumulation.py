@@ -0,0 +1,87 @@
+"""
+Accumulating a streamed answer: the old `response_text +=` loop that
+printed every token (and appended the closing aggregate on top of the
+deltas) vs. ResponseAccumulator with and without the rate-limited
+ConsoleSink. Output goes to os.devnull; writes/flushes are counted.
+
+    python -m benchmarks.response_accumulation --tokens 10000
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+from stream_adk import ConsoleSink, ResponseAccumulator, StreamEvent, TEXT
+
+
+class CountingDevnull:
+    def __init__(self):
+        self._f = open(os.devnull, "w")
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return self._f.write(text)
+
+    def flush(self):
+        self.flushes += 1
+        self._f.flush()
+
+
+def synthetic_stream(n_tokens: int, seed: int = 7) -> list[StreamEvent]:
+    """n partial deltas of JSON-ish text, then the closing full text."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + '  ",:{}[]'
+    tokens = ["".join(rng.choices(alphabet, k=rng.randint(1, 6))) for _ in range(n_tokens)]
+    items = [StreamEvent(TEXT, t, partial=True) for t in tokens]
+    items.append(StreamEvent(TEXT, "".join(tokens), partial=False))
+    return items
+
+
+def old_loop(items, out):
+    response_text = ""
+    for item in items:
+        # both partial and final text were printed and appended
+        print(item.value, end="", flush=True, file=out)
+        response_text += item.value
+    return response_text
+
+
+def accumulator(items, out):
+    response = ResponseAccumulator(ConsoleSink(out) if out else None)
+    for item in items:
+        response.add(item)
+    return response.close()
+
+
+def main(args):
+    items = synthetic_stream(args.tokens)
+    expected = items[-1].value
+    print(f"stream: {args.tokens} tokens, {len(expected)} chars")
+
+    runs = [
+        ("+= / print per token", old_loop, True),
+        ("accumulator + sink", accumulator, True),
+        ("accumulator, no echo", accumulator, False),
+    ]
+    for label, fn, echo in runs:
+        best = float("inf")
+        for _ in range(args.repeat):
+            out = CountingDevnull() if echo else None
+            t0 = time.perf_counter()
+            text = fn(items, out)
+            best = min(best, time.perf_counter() - t0)
+        print(
+            f"{label:<22} {best * 1000:8.2f}ms  "
+            f"writes={out.writes if out else 0:>6}  flushes={out.flushes if out else 0:>6}  "
+            f"chars={len(text):>7}  correct={text == expected}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
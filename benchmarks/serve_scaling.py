@@ -0,0 +1,156 @@
+"""
+Requests/sec of `serve.py` as the worker count grows, against the stub
+upstream. Load comes from separate client processes firing MCP
+tools/call requests (stateless JSON-RPC over HTTP) at a mix of tools; the
+upstream-backed ones are answered from the shared sqlite cache after the
+first call, so the measurement is dominated by server CPU, which is what
+more workers add.
+
+    python -m benchmarks.serve_scaling --workers 1 2 4 --seconds 10
+
+Scaling is bounded by the cores available to the server *and* the load
+generator: on an N-core box expect near-linear gains up to ~N/2 workers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+import httpx
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+OD = {"origin": "Bangalore", "destination": "Coorg"}
+CALLS = [
+    ("analyze_roadtrip_mood", {"mood": "heartbreak"}),
+    ("plan_route", OD),
+    ("estimate_fuel_cost", {"distance_km": 265}),
+    ("find_stops_along_route", {**OD, "kind": "scenic"}),
+    ("generate_roadtrip_itinerary", {"destination": "Coorg", "days": 3}),
+]
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def call_body(i: int) -> dict:
+    name, args = CALLS[i % len(CALLS)]
+    return {
+        "jsonrpc": "2.0",
+        "id": i,
+        "method": "tools/call",
+        "params": {"name": name, "arguments": {"input": args}},
+    }
+
+
+async def client_loop(url: str, stop_at: float, concurrency: int) -> tuple[int, int]:
+    ok = errors = 0
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(offset):
+            nonlocal ok, errors
+            i = offset
+            while time.monotonic() < stop_at:
+                try:
+                    resp = await client.post(url, json=call_body(i), headers=HEADERS)
+                    if resp.status_code == 200 and '"isError":true' not in resp.text:
+                        ok += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                i += 1
+        await asyncio.gather(*(one(k) for k in range(concurrency)))
+    return ok, errors
+
+
+def load_process(url, stop_at, concurrency, results):
+    results.put(asyncio.run(client_loop(url, stop_at, concurrency)))
+
+
+def wait_ready(port: int, workers: int, timeout: float = 30):
+    """Until /ready has answered 200 from `workers` distinct processes."""
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and len(pids) < workers:
+        try:
+            # a new connection each time, so SO_REUSEPORT picks a worker
+            resp = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+            if resp.status_code == 200:
+                pids.add(resp.json()["pid"])
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    if len(pids) < workers:
+        raise RuntimeError(f"only {len(pids)}/{workers} workers became ready")
+
+
+def run_level(workers: int, args) -> dict:
+    from serve import serve
+
+    port = args.port
+    server = multiprocessing.Process(
+        target=serve,
+        kwargs={"workers": workers, "port": port, "drain": 5},
+    )
+    server.start()
+    try:
+        wait_ready(port, workers)
+        url = f"http://127.0.0.1:{port}/mcp"
+        # warm the shared cache once
+        httpx.post(url, json=call_body(1), headers=HEADERS, timeout=30)
+
+        results = multiprocessing.Queue()
+        stop_at = time.monotonic() + args.seconds
+        loaders = [
+            multiprocessing.Process(target=load_process, args=(url, stop_at, args.concurrency, results))
+            for _ in range(args.clients)
+        ]
+        t0 = time.monotonic()
+        for p in loaders:
+            p.start()
+        totals = [results.get() for _ in loaders]
+        elapsed = time.monotonic() - t0
+        for p in loaders:
+            p.join()
+    finally:
+        server.terminate()
+        server.join()
+
+    ok = sum(t[0] for t in totals)
+    return {"workers": workers, "ok": ok, "errors": sum(t[1] for t in totals), "rps": ok / elapsed}
+
+
+def main(args):
+    from benchmarks.stub_upstream import start_in_background
+
+    stub = start_in_background(args.stub_port, args.latency_ms)
+    # inherited by the workers, read when they import upstream.py
+    os.environ["UPSTREAM_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}"
+    # the stub has no quota to protect
+    for name in ("MAPS", "WEATHER", "CSE"):
+        os.environ[f"{name}_QPS"] = "0"
+    print(f"cpus={os.cpu_count()}  clients={args.clients}x{args.concurrency}  {args.seconds}s per level")
+    try:
+        base = None
+        for n in args.workers:
+            # fresh shared cache per level
+            os.environ["CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+            r = run_level(n, args)
+            base = base or r["rps"]
+            print(
+                f"workers={r['workers']:>2}  ok={r['ok']:>7}  errors={r['errors']:>4}  "
+                f"{r['rps']:8.1f} req/s  speedup={r['rps'] / base:4.2f}x"
+            )
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=5013)
+    parser.add_argument("--stub-port", type=int, default=5099)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,191 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions endpoint with
+provider prompt caching, so LLM latency and spend can be measured without
+network access or API credits:
+
+    python -m benchmarks.stub_llm --port 5098 --base-ms 150 --prefill-tok-s 5000
+
+- every request streams --answer-tokens tokens at --decode-tok-s, then a
+  usage chunk (prompt_tokens, prompt_tokens_details.cached_tokens)
+- time to first token = --base-ms + uncached prompt tokens / --prefill-tok-s
+- tokens are estimated as 4 characters of the request JSON each
+- prompt caching is explicit, as Anthropic / MiniMax do it: the tools and
+  the messages up to the last one marked with cache_control are a prefix;
+  a prefix seen before is read from the cache (cached_tokens) and skips
+  prefill
+- --error-rate: answer 429 like a rate-limited free tier
+- --stall-rate: hold the first token for --stall-s
+
+The faults (and --base-ms) can be changed while it runs:
+
+    POST /_faults  {"base_ms": 800, "error_rate": 1.0}
+    GET  /_stats   requests, errors, prompt / cached / completion tokens
+
+Point LiteLlm at it with api_base=http://127.0.0.1:5098/v1.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from benchmarks import stub_server
+# the benchmarks import these from the stub they run
+from benchmarks.stub_server import set_faults, stub_stats
+
+ANSWER = "Here is your road trip plan. "
+ERROR_BODY = {"error": {"message": "stub LLM: rate limited", "type": "rate_limit_error", "code": 429}}
+
+
+def estimate_tokens(obj) -> int:
+    return max(1, len(json.dumps(obj, separators=(",", ":"))) // 4)
+
+
+def _marked(message: dict) -> bool:
+    if message.get("cache_control"):
+        return True
+    content = message.get("content")
+    return isinstance(content, list) and any(
+        isinstance(block, dict) and block.get("cache_control") for block in content
+    )
+
+
+def cached_prefix(body: dict) -> list:
+    """Tools + messages up to the last cache breakpoint ([] without one)."""
+    messages = body.get("messages", [])
+    marks = [i for i, m in enumerate(messages) if _marked(m)]
+    if not marks:
+        return []
+    return [body.get("tools", []), messages[: marks[-1] + 1]]
+
+
+def build_app(
+    base_ms: float = 150,
+    prefill_tok_s: float = 5000,
+    decode_tok_s: float = 50,
+    answer_tokens: int = 40,
+    error_rate: float = 0.0,
+    stall_rate: float = 0.0,
+    stall_s: float = 30.0,
+    seed: int | None = 0,
+) -> Starlette:
+    rng = random.Random(seed)
+    faults = {"base_ms": base_ms, "error_rate": error_rate, "stall_rate": stall_rate, "stall_s": stall_s}
+    prefixes = set()
+    totals = Counter()
+
+    def chunk(delta: dict | None, finish: str | None = None, usage: dict | None = None) -> str:
+        data = {
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": "stub",
+            "choices": [] if usage else [{"index": 0, "delta": delta or {}, "finish_reason": finish}],
+        }
+        if usage:
+            data["usage"] = usage
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def completions(request):
+        body = await request.json()
+        roll = rng.random()
+        if roll < faults["error_rate"]:
+            totals["errors"] += 1
+            return JSONResponse(ERROR_BODY, status_code=429)
+        stall = faults["stall_s"] if roll < faults["error_rate"] + faults["stall_rate"] else 0.0
+        prompt = estimate_tokens([body.get("tools", []), body.get("messages", [])])
+        cached = 0
+        prefix = cached_prefix(body)
+        if prefix:
+            digest = hashlib.sha256(json.dumps(prefix, sort_keys=True).encode()).hexdigest()
+            if digest in prefixes:
+                cached = min(estimate_tokens(prefix), prompt)
+            prefixes.add(digest)
+        totals["requests"] += 1
+        totals["prompt_tokens"] += prompt
+        totals["cached_tokens"] += cached
+        totals["completion_tokens"] += answer_tokens
+        usage = {
+            "prompt_tokens": prompt,
+            "completion_tokens": answer_tokens,
+            "total_tokens": prompt + answer_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+        async def stream():
+            await asyncio.sleep(stall + faults["base_ms"] / 1000 + (prompt - cached) / prefill_tok_s)
+            words = (ANSWER * answer_tokens).split(" ")[:answer_tokens]
+            for word in words:
+                yield chunk({"role": "assistant", "content": word + " "})
+                await asyncio.sleep(1 / decode_tok_s)
+            yield chunk({}, finish="stop")
+            yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        if not body.get("stream"):
+            await asyncio.sleep(
+                stall + faults["base_ms"] / 1000 + (prompt - cached) / prefill_tok_s
+                + answer_tokens / decode_tok_s
+            )
+            return JSONResponse({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                    "role": "assistant", "content": (ANSWER * answer_tokens)[: answer_tokens * 4],
+                }}],
+                "usage": usage,
+            })
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def health(request):
+        return JSONResponse({"ok": True})
+
+    async def update_faults(request):
+        changes = await request.json()
+        unknown = set(changes) - set(faults)
+        if unknown:
+            return JSONResponse({"error": f"unknown faults: {sorted(unknown)}"}, status_code=400)
+        faults.update({name: float(value) for name, value in changes.items()})
+        return JSONResponse(faults)
+
+    async def stats(request):
+        return JSONResponse(dict(totals))
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/health", health),
+        Route("/_faults", update_faults, methods=["POST"]),
+        Route("/_stats", stats),
+    ])
+
+
+def serve(port: int, **kwargs):
+    stub_server.serve(build_app, port, **kwargs)
+
+
+def start_in_background(port: int, **kwargs) -> multiprocessing.Process:
+    """Run the stub in a child process and wait until it answers."""
+    return stub_server.start_in_background(build_app, port, name="stub LLM", **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--base-ms", type=float, default=150)
+    parser.add_argument("--prefill-tok-s", type=float, default=5000)
+    parser.add_argument("--decode-tok-s", type=float, default=50)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-s", type=float, default=30.0)
+    args = parser.parse_args()
+    serve(
+        args.port, base_ms=args.base_ms, prefill_tok_s=args.prefill_tok_s,
+        decode_tok_s=args.decode_tok_s, answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate, stall_rate=args.stall_rate, stall_s=args.stall_s,
+    )
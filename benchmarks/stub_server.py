@@ -0,0 +1,42 @@
+"""
+Running the stubs (stub_upstream.py, stub_llm.py) on a local port: in the
+foreground, or in a child process for a benchmark, plus the /_faults and
+/_stats endpoints both of them serve.
+"""
+import multiprocessing
+import time
+
+import httpx
+import uvicorn
+
+
+def serve(build_app, port: int, *args, **kwargs):
+    uvicorn.run(build_app(*args, **kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_in_background(build_app, port: int, *args, name: str = "stub", **kwargs) -> multiprocessing.Process:
+    """Run build_app(*args, **kwargs) in a child process and wait until it answers."""
+    proc = multiprocessing.Process(
+        target=serve, args=(build_app, port, *args), kwargs=kwargs, daemon=True,
+    )
+    proc.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"{name} did not start")
+
+
+def set_faults(port: int, **faults) -> dict:
+    """Change the faults of a running stub; returns the full fault config."""
+    resp = httpx.post(f"http://127.0.0.1:{port}/_faults", json=faults, timeout=5)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def stub_stats(port: int) -> dict:
+    return httpx.get(f"http://127.0.0.1:{port}/_stats", timeout=5).json()
@@ -0,0 +1,194 @@
+"""
+Local stand-in for Google Maps / Places, Open-Meteo and CSE.
+
+Replays the recorded responses in benchmarks/fixtures/ so the tools can be
+measured without network access or API spend. Latency and failures are
+drawn from configurable distributions (seeded, so runs are repeatable):
+
+    python -m benchmarks.stub_upstream --port 5099 --latency-ms 200 \\
+        --latency-sigma 0.5 --error-rate 0.02 --timeout-rate 0.01
+
+- latency: log-normal around --latency-ms (the median); --latency-sigma 0
+  gives a fixed delay
+- --error-rate: answer 503 with a Google-style error body
+- --timeout-rate: hold the request for --timeout-s (past the client timeout)
+- --qps-limit: answer 429 (Retry-After: 1) to requests over this many per
+  second, like a quota; 0 = unlimited
+
+The faults can be changed while it runs (brownouts, outages, recovery):
+
+    POST /_faults  {"latency_ms": 800, "error_rate": 1.0}
+    GET  /_stats   requests served so far, per path
+
+Point the server at it with UPSTREAM_BASE_URL=http://127.0.0.1:5099.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter, deque
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks import stub_server
+# the benchmarks import these from the stub they run
+from benchmarks.stub_server import set_faults, stub_stats
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# path -> recorded response
+FIXTURES = {
+    "/maps/api/directions/json": "directions.json",
+    "/maps/api/place/nearbysearch/json": "places_nearby.json",
+    "/v1/forecast": "forecast.json",
+    "/customsearch/v1": "cse_images.json",
+}
+
+ERROR_BODY = {"status": "UNKNOWN_ERROR", "error_message": "stub upstream: injected failure"}
+QUOTA_BODY = {"status": "OVER_QUERY_LIMIT", "error_message": "stub upstream: over the QPS limit"}
+
+
+def load_fixtures(directory: str = FIXTURES_DIR) -> dict:
+    fixtures = {}
+    for path, filename in FIXTURES.items():
+        with open(os.path.join(directory, filename)) as f:
+            fixtures[path] = json.load(f)
+    return fixtures
+
+
+def build_app(
+    latency_ms: float,
+    latency_sigma: float = 0.0,
+    error_rate: float = 0.0,
+    timeout_rate: float = 0.0,
+    timeout_s: float = 30.0,
+    qps_limit: float = 0.0,
+    seed: int | None = 0,
+    fixtures_dir: str = FIXTURES_DIR,
+) -> Starlette:
+    fixtures = load_fixtures(fixtures_dir)
+    rng = random.Random(seed)
+    faults = {
+        "latency_ms": latency_ms,
+        "latency_sigma": latency_sigma,
+        "error_rate": error_rate,
+        "timeout_rate": timeout_rate,
+        "timeout_s": timeout_s,
+        "qps_limit": qps_limit,
+    }
+    served = Counter()
+    recent = deque()  # arrival times within the last second
+
+    def delay() -> float:
+        median = faults["latency_ms"] / 1000
+        if faults["latency_sigma"] <= 0 or median <= 0:
+            return median
+        return rng.lognormvariate(math.log(median), faults["latency_sigma"])
+
+    async def replay(request, payload):
+        served[request.url.path] += 1
+        if faults["qps_limit"] > 0:
+            now = time.monotonic()
+            while recent and recent[0] <= now - 1:
+                recent.popleft()
+            if len(recent) >= faults["qps_limit"]:
+                served["429"] += 1
+                return JSONResponse(QUOTA_BODY, status_code=429, headers={"Retry-After": "1"})
+            recent.append(now)
+        roll = rng.random()
+        if roll < faults["timeout_rate"]:
+            await asyncio.sleep(faults["timeout_s"])
+        await asyncio.sleep(delay())
+        if roll < faults["timeout_rate"] + faults["error_rate"]:
+            return JSONResponse(ERROR_BODY, status_code=503)
+        return JSONResponse(payload)
+
+    def canned(path):
+        async def endpoint(request):
+            return await replay(request, fixtures[path])
+        return endpoint
+
+    async def forecast(request):
+        # Open-Meteo answers comma-separated coordinates with a list
+        lats = request.query_params.get("latitude", "0").split(",")
+        lngs = request.query_params.get("longitude", "0").split(",")
+        recorded = fixtures["/v1/forecast"]
+        results = [
+            {**recorded, "latitude": float(lat), "longitude": float(lng)}
+            for lat, lng in zip(lats, lngs)
+        ]
+        return await replay(request, results if len(results) > 1 else results[0])
+
+    async def health(request):
+        return JSONResponse({"ok": True})
+
+    async def update_faults(request):
+        changes = await request.json()
+        unknown = set(changes) - set(faults)
+        if unknown:
+            return JSONResponse({"error": f"unknown faults: {sorted(unknown)}"}, status_code=400)
+        faults.update({name: float(value) for name, value in changes.items()})
+        return JSONResponse(faults)
+
+    async def stats(request):
+        by_path = {k: v for k, v in served.items() if k != "429"}
+        return JSONResponse({
+            "requests": sum(by_path.values()), "rejected_429": served["429"], "by_path": by_path,
+        })
+
+    routes = [Route(path, canned(path)) for path in FIXTURES if path != "/v1/forecast"]
+    return Starlette(routes=[
+        *routes,
+        Route("/v1/forecast", forecast),
+        Route("/health", health),
+        Route("/_faults", update_faults, methods=["POST"]),
+        Route("/_stats", stats),
+    ])
+
+
+def serve(port: int, latency_ms: float, **faults):
+    stub_server.serve(build_app, port, latency_ms, **faults)
+
+
+def start_in_background(port: int, latency_ms: float, **faults) -> multiprocessing.Process:
+    """Run the stub in a child process and wait until it answers."""
+    return stub_server.start_in_background(build_app, port, latency_ms, name="stub upstream", **faults)
+
+
+def stub_requests(port: int) -> int:
+    return stub_stats(port)["requests"]
+
+
+def add_fault_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-sigma", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-s", type=float, default=30.0)
+    parser.add_argument("--qps-limit", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def fault_kwargs(args: argparse.Namespace) -> dict:
+    return {
+        "latency_sigma": args.latency_sigma,
+        "error_rate": args.error_rate,
+        "timeout_rate": args.timeout_rate,
+        "timeout_s": args.timeout_s,
+        "qps_limit": args.qps_limit,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    add_fault_args(parser)
+    args = parser.parse_args()
+    serve(args.port, args.latency_ms, **fault_kwargs(args))
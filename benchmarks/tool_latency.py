@@ -0,0 +1,156 @@
+"""
+Per-tool latency baseline against the replaying stub upstream: p50 / p95 /
+p99 and calls/s for every MCP tool, no network needed.
+
+    python -m benchmarks.tool_latency --calls 200 --concurrency 8
+    python -m benchmarks.tool_latency --json baseline.json
+    python -m benchmarks.tool_latency --baseline baseline.json   # exit 1 on regression
+
+Each tool is called through an in-process MCP client. With --cache cold
+(the default) the response caches are cleared before every call, so the
+numbers cover the upstream path; --cache warm measures cache hits.
+Stub latency and failures are set with the same flags as
+benchmarks/stub_upstream.py (--latency-sigma, --error-rate, ...).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+from fastmcp import Client
+
+import server
+from cache import CACHES
+from upstream import point_upstreams_at
+
+OD = {"origin": "Bangalore", "destination": "Coorg"}
+POINT = {"lat": 12.97, "lng": 77.59}
+TOOLS = [
+    ("analyze_roadtrip_mood", {"mood": "heartbreak"}),
+    ("plan_route", OD),
+    ("estimate_fuel_cost", {"distance_km": 265}),
+    ("find_scenic_spots", POINT),
+    ("find_food_rest_stops", POINT),
+    ("get_weather_on_route", POINT),
+    ("generate_trip_media", {"destination": "Coorg"}),
+    ("generate_roadtrip_itinerary", {"destination": "Coorg", "days": 3}),
+    ("enhance_destination_context", {"destination": "Coorg"}),
+    ("find_stops_along_route", {**OD, "kind": "scenic"}),
+    ("get_weather_along_route", OD),
+    ("plan_full_trip", {**OD, "mood": "heartbreak"}),
+]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    # nearest-rank
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, round(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def is_error(result) -> bool:
+    structured = result.structured_content
+    return result.is_error or (isinstance(structured, dict) and "error" in structured)
+
+
+async def bench_tool(client: Client, name: str, args: dict, calls: int, concurrency: int, cold: bool) -> dict:
+    latencies = []
+    errors = 0
+    queue = iter(range(calls))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            if cold:
+                for cache in CACHES.values():
+                    cache.clear()
+            t0 = time.perf_counter()
+            try:
+                result = await client.call_tool(name, {"input": args}, raise_on_error=False)
+                errors += is_error(result)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "tool": name,
+        "calls": len(latencies),
+        "errors": errors,
+        "calls_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def regressions(results: list, baseline: dict, tolerance: float) -> list[str]:
+    out = []
+    for r in results:
+        before = baseline.get(r["tool"])
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if r[key] > before[key] * (1 + tolerance):
+                out.append(f"{r['tool']}: {key} {before[key]:.1f} -> {r[key]:.1f}")
+    return out
+
+
+async def main(args) -> int:
+    wanted = set(args.tools or [name for name, _ in TOOLS])
+    results = []
+    async with Client(server.app) as client:
+        for name, tool_args in TOOLS:
+            if name not in wanted:
+                continue
+            r = await bench_tool(client, name, tool_args, args.calls, args.concurrency, args.cache == "cold")
+            results.append(r)
+            print(
+                f"{name:<28} calls={r['calls']:>5}  errors={r['errors']:>4}  "
+                f"{r['calls_per_sec']:8.1f}/s  p50={r['p50_ms']:7.1f}ms  "
+                f"p95={r['p95_ms']:7.1f}ms  p99={r['p99_ms']:7.1f}ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({r["tool"]: r for r in results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print("REGRESSION", line)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    from benchmarks.stub_upstream import add_fault_args, fault_kwargs, start_in_background
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tools", nargs="+")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--baseline", help="compare against a previous --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=5099)
+    add_fault_args(parser)
+    args = parser.parse_args()
+
+    stub = start_in_background(args.port, args.latency_ms, **fault_kwargs(args))
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    try:
+        code = asyncio.run(main(args))
+    finally:
+        stub.terminate()
+    sys.exit(code)
@@ -0,0 +1,88 @@
+"""
+Tool-call throughput of the MCP server against the local stub upstream.
+
+Each "session" is its own MCP client connected to the in-process server and
+calls the upstream-backed tools in a loop. With blocking tool bodies the
+throughput stays flat as sessions grow; with the pooled async client it
+should scale until the pool limits are reached.
+
+    python -m benchmarks.tool_throughput --sessions 1 10 100 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "stub")
+
+from fastmcp import Client
+
+import server
+from upstream import point_upstreams_at
+
+CALLS = [
+    ("plan_route", {"origin": "Bangalore", "destination": "Coorg"}),
+    ("find_scenic_spots", {"lat": 12.97, "lng": 77.59}),
+    ("find_food_rest_stops", {"lat": 12.97, "lng": 77.59}),
+    ("get_weather_on_route", {"lat": 12.97, "lng": 77.59}),
+    ("generate_trip_media", {"destination": "Coorg"}),
+]
+
+
+async def session_loop(stop_at: float, latencies: list):
+    async with Client(server.app) as client:
+        i = 0
+        while time.perf_counter() < stop_at:
+            name, args = CALLS[i % len(CALLS)]
+            t0 = time.perf_counter()
+            await client.call_tool(name, {"input": args})
+            latencies.append(time.perf_counter() - t0)
+            i += 1
+
+
+async def run_level(sessions: int, seconds: float) -> dict:
+    latencies = []
+    stop_at = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session_loop(stop_at, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "calls": len(latencies),
+        "calls_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main(args):
+    # the first connected client owns the server lifespan (and with it the
+    # shared upstream client), so keep one open for the whole run
+    async with Client(server.app):
+        for n in args.sessions:
+            r = await run_level(n, args.seconds)
+            print(
+                f"sessions={r['sessions']:>4}  calls={r['calls']:>6}  "
+                f"throughput={r['calls_per_sec']:8.1f}/s  "
+                f"p50={r['p50_ms']:7.1f}ms  p95={r['p95_ms']:7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    from benchmarks.stub_upstream import start_in_background
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    stub = start_in_background(args.port, args.latency_ms)
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    try:
+        asyncio.run(main(args))
+    finally:
+        stub.terminate()
@@ -0,0 +1,132 @@
+"""
+Cost of tracing on the tool-call path: the same loop of in-process MCP
+tool calls with tracing off, sampled at TRACE_SAMPLE_RATIO, and fully
+sampled into the file exporter. Each call runs under an agent-side root
+span and carries its context in input._trace, as in production.
+
+    python -m benchmarks.tracing_overhead --calls 2000 --ratio 0.01
+
+Two workloads:
+  local     tools that never reach the upstream (mood, itinerary, a warm
+            plan_route): the worst case, tracing vs. a ~0.2ms call
+  upstream  route / weather / places calls with cold caches against the
+            stub upstream (--latency-ms): what a loaded server does
+
+The global tracer provider can only be set once per process, so every
+mode runs in its own subprocess.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+LOCAL_CALLS = [
+    ("analyze_roadtrip_mood", {"mood": "heartbreak"}),
+    ("generate_roadtrip_itinerary", {"destination": "Coorg", "days": 3}),
+    ("plan_route", {"origin": "Bangalore", "destination": "Coorg"}),
+]
+UPSTREAM_CALLS = [
+    ("plan_route", {"origin": "Bangalore", "destination": "Coorg"}),
+    ("get_weather_on_route", {"lat": 12.97, "lng": 77.59}),
+    ("find_scenic_spots", {"lat": 12.97, "lng": 77.59}),
+]
+
+
+async def run_mode(calls: int, workload: str) -> float:
+    from fastmcp import Client
+
+    import server
+    from cache import CACHES
+    from tracing import inject_trace, tracer
+
+    tool_calls = LOCAL_CALLS if workload == "local" else UPSTREAM_CALLS
+    async with Client(server.app) as client:
+        # warm up (and fill the directions cache)
+        for name, args in tool_calls:
+            await client.call_tool(name, {"input": args})
+        elapsed = 0.0
+        for i in range(calls):
+            name, args = tool_calls[i % len(tool_calls)]
+            if workload == "upstream":
+                for cache in CACHES.values():
+                    cache.clear()
+            t0 = time.perf_counter()
+            with tracer.start_as_current_span("roadtrip.prompt"):
+                await client.call_tool(name, inject_trace({"input": dict(args)}))
+            elapsed += time.perf_counter() - t0
+        return elapsed / calls
+
+
+def child(args):
+    import contextlib
+
+    from benchmarks.stub_upstream import start_in_background
+    from tracing import setup_tracing, shutdown_tracing
+    from upstream import point_upstreams_at
+
+    stub = start_in_background(args.port, args.latency_ms)
+    point_upstreams_at(f"http://127.0.0.1:{args.port}")
+    setup_tracing("roadtrip-bench", exporter=args.mode, ratio=args.ratio)
+    try:
+        # tool bodies print progress lines
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            per_call = asyncio.run(run_mode(args.calls, args.workload))
+    finally:
+        shutdown_tracing()
+        stub.terminate()
+    print(json.dumps({"per_call": per_call}))
+
+
+def measure(args, workload: str, exporter: str, ratio: float, calls: int, env: dict) -> float:
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.tracing_overhead", "--child",
+             "--workload", workload, "--mode", exporter, "--ratio", str(ratio),
+             "--calls", str(calls), "--latency-ms", str(args.latency_ms),
+             "--port", str(args.port)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1])["per_call"])
+    return statistics.median(runs)
+
+
+def main(args):
+    trace_file = os.path.join(tempfile.mkdtemp(), "spans.jsonl")
+    env = dict(os.environ, GOOGLE_MAPS_API_KEY="stub", TRACE_FILE=trace_file)
+    modes = [
+        ("off", "none", 0.0),
+        (f"sampled {args.ratio:g}", "file", args.ratio),
+        ("sampled 1", "file", 1.0),
+    ]
+    for workload in args.workloads:
+        calls = args.calls if workload == "local" else max(args.calls // 20, 20)
+        print(f"{workload} ({calls} calls)")
+        base = None
+        for label, exporter, ratio in modes:
+            per_call = measure(args, workload, exporter, ratio, calls, env)
+            base = base or per_call
+            print(
+                f"  {label:<14} {per_call * 1e3:8.3f}ms/call  "
+                f"+{(per_call - base) * 1e6:6.1f}us  overhead={(per_call / base - 1) * 100:+6.2f}%"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=3000)
+    parser.add_argument("--ratio", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workloads", nargs="+", default=["local", "upstream"])
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--workload", default="local")
+    parser.add_argument("--mode", default="none")
+    args = parser.parse_args()
+    child(args) if args.child else main(args)
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------------------------------
+#  Response caches for paid upstream calls
+# -----------------------------------------------------
+# Two interchangeable backends with the same get / get_stale / set / stats
+# surface (get_stale ignores the TTL: the fallback while an upstream is down):
+#   - LRUCache     in-process, microsecond hits, lost on restart
+#   - SQLiteCache  on-disk, survives restarts, shared by every process
+#                  pointing at the same file
+# Pick one with CACHE_BACKEND=memory|sqlite (default memory).
+#
+# Async code (the tools) uses aget / aget_many / aget_stale / aset: the
+# SQLite backend runs its queries in a worker thread there, so a busy
+# database file never stalls the event loop. A hit does not write:
+# last-access times are collected in memory and written in one batch with
+# the next set(), or once CACHE_TOUCH_BATCH of them are pending.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", ".cache/roadtrip.sqlite3")
+CACHE_TOUCH_BATCH = int(os.getenv("CACHE_TOUCH_BATCH", "256"))
+
+# every cache built through make_cache, by name, for stats reporting
+CACHES = {}
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def get_stale(self, key: str):
+        """The value even if expired (until evicted); no hit / miss counted."""
+        with self._lock:
+            item = self._data.get(key)
+        return None if item is None else item[1]
+
+    def set(self, key: str, value, ttl: float | None = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys: list[str]) -> dict:
+        """{key: value} for the keys that hit."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    # in memory already: no thread hop
+    async def aget(self, key: str):
+        return self.get(key)
+
+    async def aget_many(self, keys: list[str]) -> dict:
+        return self.get_many(keys)
+
+    async def aget_stale(self, key: str):
+        return self.get_stale(key)
+
+    async def aset(self, key: str, value, ttl: float | None = None):
+        self.set(key, value, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    def __init__(self, path: str, namespace: str, maxsize: int = 10000, ttl: float = 3600):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> last hit, not yet written
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)"
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= CACHE_TOUCH_BATCH:
+                self._flush_touched()
+        return json.loads(row[0])
+
+    def get_many(self, keys: list[str]) -> dict:
+        """{key: value} for the keys that hit, in one query."""
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        rows = []
+        with self._lock:
+            # stay under SQLite's bound-variable limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows += self._conn.execute(
+                    "SELECT key, value FROM cache WHERE namespace = ? AND expires_at >= ?"
+                    f" AND key IN ({','.join('?' * len(chunk))})",
+                    (self.namespace, now, *chunk),
+                ).fetchall()
+            self.hits += len(rows)
+            self.misses += len(keys) - len(rows)
+            for key, _ in rows:
+                self._touched[key] = now
+            if len(self._touched) >= CACHE_TOUCH_BATCH:
+                self._flush_touched()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_stale(self, key: str):
+        """The value even if expired (until evicted); no hit / miss counted."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float | None = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._touched.pop(key, None)
+            # the eviction below needs current access times
+            self._flush_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at, now),
+            )
+            # size cap: drop the least recently used rows past maxsize
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache WHERE namespace = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxsize),
+            )
+
+    def _flush_touched(self):
+        # caller holds self._lock
+        if not self._touched:
+            return
+        touched = [(at, self.namespace, key) for key, at in self._touched.items()]
+        self._touched.clear()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE cache SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?",
+                touched,
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def aget(self, key: str):
+        return await asyncio.to_thread(self.get, key)
+
+    async def aget_many(self, keys: list[str]) -> dict:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aget_stale(self, key: str):
+        return await asyncio.to_thread(self.get_stale, key)
+
+    async def aset(self, key: str, value, ttl: float | None = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def make_cache(name: str, maxsize: int, ttl: float, backend: str | None = None):
+    backend = backend or CACHE_BACKEND
+    if backend == "sqlite":
+        cache = SQLiteCache(CACHE_PATH, namespace=name, maxsize=maxsize, ttl=ttl)
+    elif backend == "memory":
+        cache = LRUCache(maxsize=maxsize, ttl=ttl)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+    CACHES[name] = cache
+    return cache
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in CACHES.items()}
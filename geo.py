@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+
+# -----------------------------------------------------
+#  Geometry helpers shared by the Places / route tools
+# -----------------------------------------------------
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+# -----------------------------------------------------
+#  Tile grid
+# -----------------------------------------------------
+# Square lat/lng tiles on a power-of-two ladder of sizes (0.01°, 0.02°,
+# 0.04°, ...). Tiles of one size line up for every query, which is what
+# lets two nearby requests share cached results.
+BASE_TILE_DEG = 0.01
+
+
+def tile_size_for_radius(radius_m: float, factor: float = 2.0, max_tile_radius_m: float | None = None) -> float:
+    """
+    Smallest ladder size whose side is at least factor * radius, but no
+    larger than keeps every tile's circumradius within max_tile_radius_m
+    (wide queries then take more tiles).
+    """
+    target_deg = factor * radius_m / METERS_PER_DEG_LAT
+    size = BASE_TILE_DEG
+    while size < target_deg:
+        if max_tile_radius_m is not None and _max_tile_radius_m(size * 2) > max_tile_radius_m:
+            break
+        size *= 2
+    return size
+
+
+def _max_tile_radius_m(size: float) -> float:
+    # widest at the equator
+    return size * METERS_PER_DEG_LAT * math.sqrt(2) / 2
+
+
+def tile_bounds(ix: int, iy: int, size: float):
+    """(south, west, north, east) of tile (ix, iy)."""
+    return iy * size, ix * size, (iy + 1) * size, (ix + 1) * size
+
+
+def tile_center(ix: int, iy: int, size: float):
+    return (iy + 0.5) * size, (ix + 0.5) * size
+
+
+def tile_radius_m(iy: int, size: float) -> float:
+    """Radius of the circle circumscribing the tile, measured at its centre."""
+    lat = (iy + 0.5) * size
+    h = size * METERS_PER_DEG_LAT
+    w = size * METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+    return math.hypot(h, w) / 2
+
+
+def tiles_covering(lat: float, lng: float, radius_m: float, size: float):
+    """Every tile (ix, iy) that intersects the circle around (lat, lng)."""
+    dlat = radius_m / METERS_PER_DEG_LAT
+    dlng = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+    tiles = []
+    for iy in range(math.floor((lat - dlat) / size), math.floor((lat + dlat) / size) + 1):
+        for ix in range(math.floor((lng - dlng) / size), math.floor((lng + dlng) / size) + 1):
+            south, west, north, east = tile_bounds(ix, iy, size)
+            # closest point of the tile to the centre
+            near_lat = min(max(lat, south), north)
+            near_lng = min(max(lng, west), east)
+            if haversine_m(lat, lng, near_lat, near_lng) <= radius_m:
+                tiles.append((ix, iy))
+    return tiles
+
+
+# -----------------------------------------------------
+#  Route polylines (NumPy)
+# -----------------------------------------------------
+def decode_polyline(encoded: str) -> np.ndarray:
+    """
+    Decode a Google encoded polyline into an (n, 2) array of (lat, lng).
+    Works on the whole byte string at once instead of a per-char loop.
+    """
+    if not encoded:
+        return np.empty((0, 2))
+    b = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+
+    # every value is a run of 5-bit chunks; a chunk without the 0x20
+    # continuation bit ends the run
+    ends = np.flatnonzero(b < 0x20)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    b = b[: ends[-1] + 1] if len(ends) else b[:0]
+    run = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shift = 5 * (np.arange(len(b)) - starts[run])
+    values = np.add.reduceat((b & 0x1F) << shift, starts) if len(b) else b
+
+    # zig-zag decode, then the deltas accumulate into coordinates
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    deltas = deltas[: len(deltas) // 2 * 2].reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / 1e5
+
+
+def _segment_lengths_m(coords: np.ndarray) -> np.ndarray:
+    lat = np.radians(coords[:, 0])
+    lng = np.radians(coords[:, 1])
+    dlat = np.diff(lat)
+    dlng = np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def route_offsets_m(coords: np.ndarray) -> np.ndarray:
+    """Cumulative distance along the route at every vertex."""
+    return np.concatenate(([0.0], np.cumsum(_segment_lengths_m(coords))))
+
+
+def resample_route(coords: np.ndarray, step_m: float) -> np.ndarray:
+    """Points every step_m metres along the route, both ends included."""
+    if len(coords) < 2:
+        return coords.copy()
+    offsets = route_offsets_m(coords)
+    targets = np.arange(0.0, offsets[-1], step_m)
+    targets = np.append(targets, offsets[-1])
+    return np.column_stack((
+        np.interp(targets, offsets, coords[:, 0]),
+        np.interp(targets, offsets, coords[:, 1]),
+    ))
+
+
+def distance_to_route_m(points: np.ndarray, coords: np.ndarray):
+    """
+    For each (lat, lng) in points: the shortest distance to the route and
+    how far along the route that closest point is, both in metres.
+    Uses a local equirectangular projection, accurate to well under 1%
+    at road-trip scales.
+    """
+    if len(coords) < 2:
+        coords = np.vstack((coords, coords))
+    lat0 = np.radians(coords[:, 0].mean())
+    scale = np.array([METERS_PER_DEG_LAT, METERS_PER_DEG_LAT * np.cos(lat0)])
+    p = points[:, None, :] * scale            # (P, 1, 2)
+    a = coords[:-1][None, :, :] * scale       # (1, S, 2)
+    ab = (coords[1:] - coords[:-1])[None, :, :] * scale
+    ab_len2 = np.maximum((ab ** 2).sum(-1), 1e-9)
+    t = np.clip(((p - a) * ab).sum(-1) / ab_len2, 0.0, 1.0)   # (P, S)
+    d = np.sqrt((((a + t[..., None] * ab) - p) ** 2).sum(-1))
+    nearest = d.argmin(axis=1)
+    rows = np.arange(len(points))
+    along = route_offsets_m(coords)[nearest] + t[rows, nearest] * np.sqrt(ab_len2[0, nearest])
+    return d[rows, nearest], along
@@ -0,0 +1,282 @@
+import json
+import re
+from typing import Any, Iterable
+
+# -----------------------------------------------------
+#  Incremental JSON parser for the streamed answer
+# -----------------------------------------------------
+# PROMPT_1 makes the model answer with one JSON document. Instead of
+# waiting for the whole string, the parser is fed the text deltas as they
+# arrive and builds the document while scanning. Whenever a value at one
+# of the watched paths closes (an itinerary day, a stop, the fuel block
+# ...) it is returned right away, so day 1 can be rendered while day 3 is
+# still being generated.
+#
+# The finished document comes straight out of the parser (no second
+# json.loads over the whole text). If the stream stops early, close()
+# repairs it: an open string is terminated, a half-written number or
+# literal and a key without value are dropped, open containers are closed.
+# Prose or ``` fences around the JSON are skipped.
+
+# "*" matches any list index
+WATCHED_PATHS = (
+    ("summary",),
+    ("route",),
+    ("fuel",),
+    ("weather",),
+    ("scenic_spots", "*"),
+    ("food_stops", "*"),
+    ("itinerary", "*"),
+    ("preview_image",),
+    ("extra_context",),
+)
+# top-level keys of the PROMPT_1 output format
+OUTPUT_KEYS = (
+    "summary", "route", "fuel", "weather", "scenic_spots",
+    "food_stops", "itinerary", "preview_image", "extra_context",
+)
+
+_STRING_STOP = re.compile(r'["\\]')
+_SCALAR_CHARS = frozenset("0123456789+-.eEtrufalsn")
+_WHITESPACE = frozenset(" \t\r\n")
+
+# parser states
+_BEFORE = 0      # skipping prose until the document starts
+_VALUE = 1       # a value is expected
+_KEY = 2         # inside an object: a key or "}" is expected
+_COLON = 3       # after a key
+_AFTER = 4       # after a value: "," or a closing bracket
+_STRING = 5
+_SCALAR = 6      # number / true / false / null
+_DONE = 7
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+def format_path(path: Iterable) -> str:
+    """("itinerary", 0, "morning") -> "itinerary[0].morning" """
+    out = ""
+    for part in path:
+        out += f"[{part}]" if isinstance(part, int) else (f".{part}" if out else part)
+    return out
+
+
+class JsonStreamParser:
+    def __init__(self, watch: Iterable[tuple] = WATCHED_PATHS):
+        self._watch = {len(p): [] for p in watch}
+        for pattern in watch:
+            self._watch[len(pattern)].append(pattern)
+        self._state = _BEFORE
+        self._stack: list = []        # open containers, outermost first
+        self._path: list = []         # key / index of each open container
+        self._key = None              # pending key of the innermost object
+        self._string_is_key = False
+        self._buf: list[str] = []     # raw text of the string / scalar being read
+        self._escape = False          # last raw char of the string was "\"
+        self._found: list = []
+        self.document = None
+        self.repaired = False
+
+    # ---------------- feeding ----------------
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> list[tuple[tuple, Any]]:
+        """Parses a chunk; returns the (path, value) pairs that completed in it."""
+        i, n = 0, len(chunk)
+        while i < n and self._state != _DONE:
+            state = self._state
+
+            if state == _STRING:
+                i = self._read_string(chunk, i)
+                continue
+
+            c = chunk[i]
+            if state == _SCALAR:
+                if c in _SCALAR_CHARS:
+                    self._buf.append(c)
+                    i += 1
+                    continue
+                self._end_scalar()
+                continue  # re-read c in the _AFTER state
+
+            i += 1
+            if c in _WHITESPACE:
+                continue
+
+            if state == _BEFORE:
+                # the answer is always an object; "[" in prose is not a start
+                if c == "{":
+                    self._open(c)
+            elif state == _VALUE:
+                self._start_value(c)
+            elif state == _KEY:
+                if c == '"':
+                    self._state, self._string_is_key = _STRING, True
+                elif c == "}" and self._key is None:
+                    self._close("}")
+                else:
+                    raise JsonStreamError(f"expected a key, got {c!r}")
+            elif state == _COLON:
+                if c != ":":
+                    raise JsonStreamError(f"expected ':', got {c!r}")
+                self._state = _VALUE
+            elif state == _AFTER:
+                if c == ",":
+                    self._state = _KEY if isinstance(self._stack[-1], dict) else _VALUE
+                elif c == "}" or c == "]":
+                    self._close(c)
+                else:
+                    raise JsonStreamError(f"expected ',' or a closing bracket, got {c!r}")
+
+        found, self._found = self._found, []
+        return found
+
+    def _start_value(self, c: str):
+        if c == "{" or c == "[":
+            self._open(c)
+        elif c == '"':
+            self._state, self._string_is_key = _STRING, False
+        elif c in _SCALAR_CHARS:
+            self._state = _SCALAR
+            self._buf.append(c)
+        elif c == "]" and isinstance(self._stack[-1], list) and not self._stack[-1]:
+            self._close("]")  # empty list
+        else:
+            raise JsonStreamError(f"expected a value, got {c!r}")
+
+    def _read_string(self, chunk: str, i: int) -> int:
+        # jump from one quote / backslash to the next instead of per char
+        while True:
+            if self._escape:
+                if i >= len(chunk):
+                    return i
+                self._buf.append(chunk[i])
+                self._escape = False
+                i += 1
+            m = _STRING_STOP.search(chunk, i)
+            if m is None:
+                self._buf.append(chunk[i:])
+                return len(chunk)
+            j = m.start()
+            self._buf.append(chunk[i:j])
+            if chunk[j] == "\\":
+                self._buf.append("\\")
+                self._escape = True
+                i = j + 1
+                continue
+            self._end_string()
+            return j + 1
+
+    # ---------------- building ----------------
+
+    def _end_string(self):
+        raw = "".join(self._buf)
+        self._buf.clear()
+        # only the escapes need decoding; plain strings skip json.loads
+        value = json.loads(f'"{raw}"') if "\\" in raw else raw
+        if self._string_is_key:
+            self._key = value
+            self._state = _COLON
+        else:
+            self._attach(value)
+
+    def _end_scalar(self):
+        raw = "".join(self._buf)
+        self._buf.clear()
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise JsonStreamError(f"invalid literal {raw!r}") from None
+        self._attach(value)
+
+    def _open(self, c: str):
+        container = {} if c == "{" else []
+        if self._stack:
+            self._path.append(self._slot())
+        self._stack.append(container)
+        self._key = None
+        self._state = _KEY if c == "{" else _VALUE
+
+    def _close(self, c: str):
+        container = self._stack.pop()
+        if (c == "}") != isinstance(container, dict):
+            raise JsonStreamError(f"mismatched {c!r}")
+        if self._stack:
+            slot = self._path.pop()
+            if isinstance(self._stack[-1], dict):
+                self._key = slot
+        self._attach(container)
+
+    def _slot(self):
+        """Key or index the next value of the innermost container goes to."""
+        top = self._stack[-1]
+        return self._key if isinstance(top, dict) else len(top)
+
+    def _attach(self, value):
+        if not self._stack:
+            self.document = value
+            self._state = _DONE
+            return
+        slot = self._slot()
+        top = self._stack[-1]
+        if isinstance(top, dict):
+            top[slot] = value
+            self._key = None
+        else:
+            top.append(value)
+        self._state = _AFTER
+        self._check((*self._path, slot), value)
+
+    def _check(self, path: tuple, value):
+        for pattern in self._watch.get(len(path), ()):
+            if all(p == "*" or p == q for p, q in zip(pattern, path)):
+                self._found.append((path, value))
+                return
+
+    # ---------------- end of stream ----------------
+
+    def close(self):
+        """The document, repaired if the stream stopped inside it."""
+        if self._state == _DONE:
+            return self.document
+        if self._state == _BEFORE:
+            return None
+
+        self.repaired = True
+        if self._state == _STRING:
+            if self._escape:
+                self._buf.pop()  # dangling backslash
+                self._escape = False
+            raw = "".join(self._buf)
+            # a cut-off \\uXXXX escape
+            raw = re.sub(r"\\u[0-9a-fA-F]{0,3}$", "", raw)
+            self._buf = [raw]
+            if self._string_is_key:
+                self._buf.clear()
+                self._state = _KEY
+            else:
+                self._end_string()
+        elif self._state == _SCALAR:
+            try:
+                self._end_scalar()
+            except JsonStreamError:
+                self._state = _VALUE  # "tru", "1e": drop it
+
+        # a key that never got its value is dropped with it
+        self._key = None
+        while self._stack:
+            self._close("}" if isinstance(self._stack[-1], dict) else "]")
+        self._found.clear()
+        return self.document
+
+
+def missing_keys(document, keys: Iterable[str] = OUTPUT_KEYS) -> list[str]:
+    """Top-level keys of the output format the document lacks."""
+    if not isinstance(document, dict):
+        return list(keys)
+    return [k for k in keys if k not in document]
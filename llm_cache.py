@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, AsyncGenerator
+
+import litellm
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.lite_llm import LiteLLMClient
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import Field
+
+from cache import make_cache
+from metrics import LLM_COST, LLM_TOKENS
+
+# -----------------------------------------------------
+#  LLM response cache and provider prompt-prefix caching
+# -----------------------------------------------------
+# Response cache (CachedLlm): every model call is keyed by
+#   model + generation config (system instruction, tool schemas)
+#   + the conversation so far: user text normalised (case, whitespace),
+#     function calls and tool results as canonical JSON, ids dropped
+# so an identical trip request replays the recorded answer, turn by
+# turn: a turn that called plan_full_trip replays the call, the tools
+# run, and when they return the same results the next turn hits too.
+# Only complete, error-free responses are stored, for LLM_CACHE_TTL.
+# Matching is exact after normalisation; a paraphrased prompt misses.
+#
+# Prompt-prefix caching (PromptCachingClient): the system instruction
+# (PROMPT_1) and the tool schemas are the same on every turn. LiteLLM
+# marks the system message with cache_control for providers that need an
+# explicit breakpoint (Anthropic, Gemini, MiniMax ... via OpenRouter) and
+# leaves it off for those that cache prefixes on their own (DeepSeek,
+# OpenAI), so the prefix is billed and prefilled at the cached rate.
+# ADK sends the system instruction as a "developer" message, which the
+# injection does not match, so the client renames it first.
+#
+#   LLM_CACHE=off / LLM_PROMPT_CACHE=off   turn either one off
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "on") != "off"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "on") != "off"
+
+PROMPT_CACHE_POINTS = [{"location": "message", "role": "system"}]
+
+
+class PromptCachingClient(LiteLLMClient):
+    """LiteLLM client that asks for a cache breakpoint after the system prompt."""
+
+    async def acompletion(self, model, messages, tools, **kwargs):
+        if messages and messages[0].get("role") == "developer":
+            messages = [{**messages[0], "role": "system"}, *messages[1:]]
+        kwargs.setdefault("cache_control_injection_points", PROMPT_CACHE_POINTS)
+        return await super().acompletion(model, messages, tools, **kwargs)
+
+
+def prompt_cache_args() -> dict:
+    """Extra LiteLlm(...) arguments for prompt-prefix caching (none when off)."""
+    return {"llm_client": PromptCachingClient()} if LLM_PROMPT_CACHE else {}
+
+
+# ---------------- cost accounting ----------------
+
+def llm_cost(model: str, usage: types.GenerateContentResponseUsageMetadata) -> float:
+    """USD from LiteLLM's price table, cached prompt tokens at their own rate; 0 if unpriced."""
+    try:
+        prompt, completion = litellm.cost_per_token(
+            model=model,
+            prompt_tokens=usage.prompt_token_count or 0,
+            completion_tokens=usage.candidates_token_count or 0,
+            cache_read_input_tokens=usage.cached_content_token_count or 0,
+        )
+    except Exception:
+        # free / unknown models are not in the price table
+        return 0.0
+    return prompt + completion
+
+
+def record_usage(model: str, usage: types.GenerateContentResponseUsageMetadata):
+    LLM_TOKENS.labels("prompt").inc(usage.prompt_token_count or 0)
+    LLM_TOKENS.labels("cached_prompt").inc(usage.cached_content_token_count or 0)
+    LLM_TOKENS.labels("completion").inc(usage.candidates_token_count or 0)
+    LLM_COST.inc(llm_cost(model, usage))
+
+
+# ---------------- response cache ----------------
+
+def _part_key(part: types.Part, user: bool):
+    if part.text is not None:
+        return ["text", " ".join(part.text.split()).casefold() if user else part.text]
+    if part.function_call:
+        return ["call", part.function_call.name, part.function_call.args]
+    if part.function_response:
+        return ["result", part.function_response.name, part.function_response.response]
+    return part.model_dump(mode="json", exclude_none=True)
+
+
+def request_key(llm_request: LlmRequest, model: str) -> str:
+    config = llm_request.config.model_dump(
+        mode="json", exclude_none=True, exclude={"labels", "http_options"},
+    )
+    contents = [
+        [c.role, [_part_key(p, c.role == "user") for p in c.parts or []]]
+        for c in llm_request.contents
+    ]
+    canonical = json.dumps(
+        [llm_request.model or model, config, contents],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _cacheable(response: LlmResponse) -> bool:
+    return response.error_code is None and bool(response.content and response.content.parts)
+
+
+def _replay(data: dict) -> LlmResponse:
+    response = LlmResponse.model_validate(data)
+    # nothing was billed for this one
+    response.usage_metadata = None
+    for part in response.content.parts:
+        if part.function_call:
+            # ids must stay unique within the session
+            part.function_call.id = f"call_{uuid.uuid4().hex[:24]}"
+    response.custom_metadata = {**(response.custom_metadata or {}), "llm_cache": "hit"}
+    return response
+
+
+class CachedLlm(BaseLlm):
+    """Answers a request seen before from the cache; anything else goes to `llm`."""
+
+    llm: BaseLlm
+    cache: Any = Field(default=None, exclude=True)
+
+    def __init__(self, llm: BaseLlm, cache=None, **kwargs):
+        if cache is None:
+            cache = make_cache("llm_responses", maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+        super().__init__(model=llm.model, llm=llm, cache=cache, **kwargs)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # before the call: LiteLlm appends to the request's contents
+        key = request_key(llm_request, self.model)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            for data in cached:
+                yield _replay(data)
+            return
+
+        model = llm_request.model or self.model
+        final = []
+        async for response in self.llm.generate_content_async(llm_request, stream=stream):
+            if not response.partial:
+                final.append(response)
+                if response.usage_metadata:
+                    # behind RoutedLlm: priced as the model that answered
+                    answered = (response.custom_metadata or {}).get("model", model)
+                    record_usage(answered, response.usage_metadata)
+            yield response
+        # a consumer that stopped early never gets here: nothing half-done is stored
+        if final and all(map(_cacheable, final)):
+            await self.cache.aset(key, [r.model_dump(mode="json", exclude_none=True) for r in final])
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import time
+import urllib.parse
+from typing import Optional
+
+import httpx
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from mcp.types import Tool as McpBaseTool
+
+# -----------------------------------------------------
+#  Cached MCP tool manifest
+# -----------------------------------------------------
+# McpToolset.get_tools() does a tools/list round-trip on every LLM turn.
+# The server publishes the same list at GET /manifest, versioned by a
+# schema hash (ETag). We keep the last manifest on disk, serve it right
+# away and revalidate it in the background with If-None-Match at most every
+# MCP_MANIFEST_REVALIDATE seconds; the tool list is only downloaded again
+# when the hash changed. Cold sessions (and restarts) therefore reach the
+# first LLM call without any round-trip.
+
+MCP_MANIFEST_CACHE = os.getenv("MCP_MANIFEST_CACHE", ".cache/mcp_manifest.json")
+MCP_MANIFEST_REVALIDATE = float(os.getenv("MCP_MANIFEST_REVALIDATE", "60"))
+
+
+def _load_disk() -> dict:
+    try:
+        with open(MCP_MANIFEST_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_disk(server_url: str, manifest: dict):
+    entries = _load_disk()
+    entries[server_url] = manifest
+    if os.path.dirname(MCP_MANIFEST_CACHE):
+        os.makedirs(os.path.dirname(MCP_MANIFEST_CACHE), exist_ok=True)
+    tmp = MCP_MANIFEST_CACHE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp, MCP_MANIFEST_CACHE)
+
+
+class CachedMcpToolset(McpToolset):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._server_url = self._connection_params.url
+        self._manifest_url = urllib.parse.urljoin(self._server_url, "/manifest")
+        self._manifest = _load_disk().get(self._server_url)
+        self._checked_at = 0.0
+        self._tools: list[MCPTool] = []
+        self._tools_hash = None
+        self._revalidating = None
+        self.manifest_fetches = 0
+
+    async def _revalidate(self):
+        headers = {}
+        if self._manifest:
+            headers["If-None-Match"] = f'"{self._manifest["schema_hash"]}"'
+        async with httpx.AsyncClient(timeout=self._connection_params.timeout) as client:
+            resp = await client.get(self._manifest_url, headers=headers)
+        if resp.status_code == 304:
+            return
+        resp.raise_for_status()
+        self.manifest_fetches += 1
+        self._manifest = resp.json()
+        _save_disk(self._server_url, self._manifest)
+
+    async def _revalidate_quietly(self):
+        try:
+            await self._revalidate()
+        except (httpx.HTTPError, ValueError) as e:
+            # keep serving the cached manifest; the MCP session will
+            # surface a real outage on the first tool call
+            print("[mcp manifest] revalidation failed:", e)
+
+    async def get_tools(
+        self,
+        readonly_context: Optional[ReadonlyContext] = None,
+    ) -> list[BaseTool]:
+        if time.monotonic() - self._checked_at > MCP_MANIFEST_REVALIDATE:
+            self._checked_at = time.monotonic()
+            if self._manifest:
+                # stale-while-revalidate: the LLM call does not wait on it
+                self._revalidating = asyncio.create_task(self._revalidate_quietly())
+            else:
+                try:
+                    await self._revalidate()
+                except (httpx.HTTPError, ValueError) as e:
+                    print("[mcp manifest] unavailable, listing tools:", e)
+        if not self._manifest:
+            # no manifest endpoint and nothing cached: plain tools/list until
+            # the next revalidation finds one
+            return await super().get_tools(readonly_context)
+
+        if self._tools_hash != self._manifest["schema_hash"]:
+            self._tools = [
+                MCPTool(
+                    mcp_tool=McpBaseTool.model_validate(tool),
+                    mcp_session_manager=self._mcp_session_manager,
+                    auth_scheme=self._auth_scheme,
+                    auth_credential=self._auth_credential,
+                    require_confirmation=self._require_confirmation,
+                    header_provider=self._header_provider,
+                )
+                for tool in self._manifest["tools"]
+            ]
+            self._tools_hash = self._manifest["schema_hash"]
+
+        return [t for t in self._tools if self._is_tool_selected(t, readonly_context)]
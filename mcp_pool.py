@@ -0,0 +1,131 @@
+import asyncio
+import os
+from typing import Callable, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+
+# -----------------------------------------------------
+#  Warm pool of MCP sessions
+# -----------------------------------------------------
+# Opening a streamable-HTTP MCP session costs an initialize handshake plus
+# tools/list before the first LLM call can go out. The pool opens its
+# sessions once, keeps them alive with periodic pings and reconnects any
+# that fail, so a prompt never pays that setup again.
+#
+# Every session is opened, health-checked and closed from one supervisor
+# task: MCP sessions live inside anyio task groups, which must be exited
+# by the same task that entered them (the cancel-scope errors the old
+# close-per-request code had to shield against).
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+MCP_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", "5"))
+# an unreachable server can leave the initialize handshake hanging forever
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "10"))
+
+
+def _stray_cancel(e: asyncio.CancelledError) -> bool:
+    # anyio tags the cancels it delivers from a cancel scope
+    return bool(e.args) and str(e.args[0]).startswith("Cancelled via cancel scope")
+
+
+class McpToolsetPool(BaseToolset):
+    def __init__(
+        self,
+        factory: Callable[[], McpToolset],
+        size: int = MCP_POOL_SIZE,
+        health_interval: float = MCP_HEALTH_INTERVAL,
+    ):
+        super().__init__()
+        self._members = [factory() for _ in range(max(size, 1))]
+        self._health_interval = health_interval
+        self._next = 0
+        self._supervisor: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self.reconnects = 0
+
+    # ---------------- lifecycle ----------------
+
+    async def start(self):
+        """Open every session up front; safe to call more than once."""
+        if self._supervisor is None or self._supervisor.done():
+            self._ready.clear()
+            self._stopping.clear()
+            self._supervisor = asyncio.create_task(self._supervise())
+        await self._ready.wait()
+
+    async def close(self) -> None:
+        if self._supervisor is not None and not self._supervisor.done():
+            self._stopping.set()
+            await self._supervisor
+        else:
+            # never started: whatever the request path opened is ours to close
+            for member in self._members:
+                await member.close()
+        self._supervisor = None
+
+    async def _supervise(self):
+        # sequential on purpose: gather() would run each check in its own
+        # short-lived task and strand the sessions it opens
+        for member in self._members:
+            await self._check(member)
+        self._ready.set()
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._health_interval)
+            except asyncio.TimeoutError:
+                for member in self._members:
+                    await self._check(member)
+        # McpToolset.close() never raises, it only logs cleanup problems
+        for member in self._members:
+            await member.close()
+
+    async def _check(self, member: McpToolset):
+        """Ping the member's session, reopening it once if it is dead."""
+        task = asyncio.current_task()
+        for attempt in range(2):
+            cancelling = task.cancelling()
+            try:
+                # asyncio.timeout, not wait_for: the session's task groups
+                # must be entered by this task, not a wrapper task
+                async with asyncio.timeout(MCP_CONNECT_TIMEOUT):
+                    session = await member._mcp_session_manager.create_session()
+                await asyncio.wait_for(session.send_ping(), MCP_PING_TIMEOUT)
+                return
+            except (Exception, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError):
+                    # a refused connection escapes the transport's cancel
+                    # scope and leaves us "cancelling": take back exactly
+                    # that cancel. Anything else (asyncio.run shutting down,
+                    # the task being cancelled) is a real cancellation.
+                    if not _stray_cancel(e) or task.cancelling() <= cancelling:
+                        raise
+                    task.uncancel()
+                    if task.cancelling() > cancelling:
+                        raise
+                print(f"[mcp pool] session unhealthy ({e!r}), reconnecting")
+                self.reconnects += 1
+                await member.close()
+        print("[mcp pool] server unreachable, will retry on next health check")
+
+    # ---------------- toolset ----------------
+
+    async def get_tools(
+        self,
+        readonly_context: Optional[ReadonlyContext] = None,
+    ) -> list[BaseTool]:
+        # round-robin: each LLM turn binds its tools to one pooled session
+        member = self._members[self._next % len(self._members)]
+        self._next += 1
+        return await member.get_tools(readonly_context)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._members),
+            "started": self._ready.is_set(),
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,238 @@
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response
+
+from cache import CACHES
+
+# -----------------------------------------------------
+#  Prometheus metrics (GET /metrics)
+# -----------------------------------------------------
+#   tools     calls by outcome, latency, in flight   (@instrument_tool)
+#   upstream  requests by HTTP status, latency, in flight   (get_json)
+#             retries, hedges, breaker state   (resilience.py)
+#             rate-limit queueing, daily quota use   (ratelimit.py)
+#   caches    hits / misses / hit ratio / size of every make_cache cache
+#   agent     LLM time to first token and total time per run, tokens and
+#             cost (llm_cache.py), model routing and health (model_router.py;
+#             the models' breakers report as upstreams)
+#
+# Under serve.py every worker has its own counters. Set
+# PROMETHEUS_MULTIPROC_DIR (an empty directory, shared by the workers) and
+# a scrape of any worker returns the sum over all of them; cache stats
+# stay per worker.
+
+TOOL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+TOOL_CALLS = Counter(
+    "roadtrip_tool_calls_total", "MCP tool calls", ["tool", "outcome"],
+)
+TOOL_LATENCY = Histogram(
+    "roadtrip_tool_duration_seconds", "MCP tool call duration", ["tool"], buckets=TOOL_BUCKETS,
+)
+TOOL_INFLIGHT = Gauge(
+    "roadtrip_tool_inflight", "MCP tool calls running", ["tool"], multiprocess_mode="livesum",
+)
+UPSTREAM_REQUESTS = Counter(
+    "roadtrip_upstream_requests_total",
+    "Upstream API requests by HTTP status (or exception name)",
+    ["upstream", "status"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "roadtrip_upstream_duration_seconds", "Upstream API request duration", ["upstream"],
+    buckets=TOOL_BUCKETS,
+)
+UPSTREAM_INFLIGHT = Gauge(
+    "roadtrip_upstream_inflight", "Upstream API requests running", ["upstream"],
+    multiprocess_mode="livesum",
+)
+UPSTREAM_RETRIES = Counter(
+    "roadtrip_upstream_retries_total", "Upstream requests retried", ["upstream"],
+)
+UPSTREAM_HEDGES = Counter(
+    "roadtrip_upstream_hedges_total",
+    "Hedged second requests by outcome (won / lost / failed)",
+    ["upstream", "outcome"],
+)
+UPSTREAM_REJECTED = Counter(
+    "roadtrip_upstream_rejected_total", "Calls failed fast by an open circuit breaker", ["upstream"],
+)
+BREAKER_OPEN = Gauge(
+    "roadtrip_upstream_breaker_open", "1 while the upstream's circuit breaker is not closed",
+    ["upstream"], multiprocess_mode="max",
+)
+RATE_LIMIT_WAIT = Histogram(
+    "roadtrip_rate_limit_wait_seconds", "Time queued for an upstream rate-limit token",
+    ["upstream", "priority"], buckets=TOOL_BUCKETS,
+)
+RATE_LIMITED = Counter(
+    "roadtrip_rate_limited_total", "Upstream requests given up after RATE_LIMIT_MAX_WAIT queued",
+    ["upstream", "priority"],
+)
+QUOTA_USED = Gauge(
+    "roadtrip_quota_used", "Daily upstream quota used so far today", ["quota"],
+    multiprocess_mode="max",
+)
+QUOTA_SKIPPED = Counter(
+    "roadtrip_quota_skipped_total", "Optional upstream calls skipped to protect a daily quota",
+    ["quota"],
+)
+STALE_SERVED = Counter(
+    "roadtrip_cache_stale_served_total", "Expired cache entries served while the upstream was down",
+    ["cache"],
+)
+LLM_TTFT = Histogram(
+    "roadtrip_llm_time_to_first_token_seconds",
+    "Prompt sent to first answer token streamed", buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "roadtrip_llm_tokens_total", "LLM tokens billed, by kind (prompt / cached_prompt / completion)",
+    ["kind"],
+)
+LLM_COST = Counter(
+    "roadtrip_llm_cost_usd_total", "Estimated LLM spend (LiteLLM price table, 0 for unpriced models)",
+)
+MODEL_ROUTED = Counter(
+    "roadtrip_llm_routed_total",
+    "LLM calls by the model that answered and how it was picked (first_choice / failover / race)",
+    ["model", "route"],
+)
+MODEL_FAILURES = Counter(
+    "roadtrip_llm_model_failures_total",
+    "LLM attempts failed (error / timeout / stream_error) or skipped (breaker_open)",
+    ["model", "reason"],
+)
+MODEL_TTFT_EWMA = Gauge(
+    "roadtrip_llm_model_ttft_ewma_seconds", "Moving average of a model's time to first chunk",
+    ["model"], multiprocess_mode="max",
+)
+MODEL_ERROR_RATE = Gauge(
+    "roadtrip_llm_model_error_rate", "Moving average of a model's error rate", ["model"],
+    multiprocess_mode="max",
+)
+AGENT_RUN = Histogram(
+    "roadtrip_agent_run_duration_seconds", "Whole agent run per prompt", ["outcome"],
+    buckets=LLM_BUCKETS,
+)
+
+
+def _outcome(result) -> str:
+    # our tools report failures as {"error": ...} rather than raising
+    return "error" if isinstance(result, dict) and "error" in result else "ok"
+
+
+def instrument_tool(fn):
+    """
+    Counts, times and tracks in-flight calls of a tool. Goes under
+    @app.tool(); functools.wraps keeps the signature FastMCP builds the
+    tool schema from.
+    """
+    name = fn.__name__
+    calls_ok = TOOL_CALLS.labels(name, "ok")
+    calls_error = TOOL_CALLS.labels(name, "error")
+    latency = TOOL_LATENCY.labels(name)
+    inflight = TOOL_INFLIGHT.labels(name)
+
+    def record(t0: float, outcome: str):
+        latency.observe(time.perf_counter() - t0)
+        (calls_ok if outcome == "ok" else calls_error).inc()
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            outcome = "error"
+            with inflight.track_inprogress():
+                try:
+                    result = await fn(*args, **kwargs)
+                    outcome = _outcome(result)
+                    return result
+                finally:
+                    record(t0, outcome)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            outcome = "error"
+            with inflight.track_inprogress():
+                try:
+                    result = fn(*args, **kwargs)
+                    outcome = _outcome(result)
+                    return result
+                finally:
+                    record(t0, outcome)
+    return wrapper
+
+
+class _UpstreamCall:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """
+    with track_upstream("maps") as call:
+        resp = await client.get(...)
+        call.status = resp.status_code
+    """
+    call = _UpstreamCall()
+    t0 = time.perf_counter()
+    UPSTREAM_INFLIGHT.labels(upstream).inc()
+    try:
+        yield call
+    except BaseException as exc:
+        call.status = type(exc).__name__
+        raise
+    finally:
+        UPSTREAM_INFLIGHT.labels(upstream).dec()
+        UPSTREAM_LATENCY.labels(upstream).observe(time.perf_counter() - t0)
+        UPSTREAM_REQUESTS.labels(upstream, str(call.status)).inc()
+
+
+class CacheCollector:
+    """Reads the hit / miss counters the caches already keep at scrape time."""
+
+    def collect(self):
+        hits = CounterMetricFamily("roadtrip_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("roadtrip_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("roadtrip_cache_hit_ratio", "Cache hit ratio", labels=["cache"])
+        size = GaugeMetricFamily("roadtrip_cache_entries", "Cached entries", labels=["cache"])
+        for name, cache in CACHES.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+            size.add_metric([name], stats["size"])
+        yield from (hits, misses, ratio, size)
+
+
+_cache_collector = CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def metrics_response() -> Response:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_cache_collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
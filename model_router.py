@@ -0,0 +1,261 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field
+
+from metrics import BREAKER_OPEN, MODEL_ERROR_RATE, MODEL_FAILURES, MODEL_ROUTED, MODEL_TTFT_EWMA
+from ratelimit import INTERACTIVE, current_priority
+from resilience import CLOSED, CircuitBreaker
+
+# -----------------------------------------------------
+#  Model routing and failover
+# -----------------------------------------------------
+# RoutedLlm sends every model call (every agent turn) to one of several
+# LiteLlm models, tracking per model:
+#
+# - EWMA of the time to the first response chunk and of the error rate;
+#   models are tried in order of expected time to a first token,
+#   ttft / (1 - error rate), the configured order breaking ties (and
+#   going first while untried). A model that has failed without ever
+#   producing a first chunk counts as MODEL_FIRST_TOKEN_TIMEOUT, so it
+#   ranks behind every model that answers. The error rate decays
+#   with MODEL_ERROR_HALF_LIFE while a model is not called, so a model
+#   that failed gets tried again once the penalty has worn off, and
+#   MODEL_EXPLORE_RATIO of the calls go to the runner-up to keep its
+#   latency current.
+# - a circuit breaker (resilience.py) that skips a model for
+#   MODEL_BREAKER_OPEN_SECONDS after repeated failures (free-tier 429s).
+#
+# A call that errors or has not produced a first chunk after
+# MODEL_FIRST_TOKEN_TIMEOUT fails over to the next model. Once a chunk
+# has been streamed to the user the call stays on that model; the next
+# turn of the session is routed afresh, so a session moves off a model
+# that started failing. The session history is plain genai contents, so
+# any model can pick it up.
+#
+# MODEL_RACE=on: streamed interactive calls go to the two best models at
+# once and the first to produce a chunk wins; the other is cancelled.
+# Cuts the tail when a free model stalls, at the price of some duplicate
+# prompt tokens, so it is off by default.
+
+MODEL_FIRST_TOKEN_TIMEOUT = float(os.getenv("MODEL_FIRST_TOKEN_TIMEOUT", "30"))
+MODEL_EWMA_ALPHA = float(os.getenv("MODEL_EWMA_ALPHA", "0.2"))
+MODEL_EXPLORE_RATIO = float(os.getenv("MODEL_EXPLORE_RATIO", "0.05"))
+MODEL_ERROR_HALF_LIFE = float(os.getenv("MODEL_ERROR_HALF_LIFE", "60"))
+MODEL_RACE = os.getenv("MODEL_RACE", "off") == "on"
+MODEL_BREAKER_OPEN_SECONDS = float(os.getenv("MODEL_BREAKER_OPEN_SECONDS", "30"))
+
+
+class ModelError(Exception):
+    """A model answered with an error response instead of content."""
+
+
+class ModelHealth:
+    def __init__(
+        self, alpha: float = MODEL_EWMA_ALPHA, half_life: float = MODEL_ERROR_HALF_LIFE,
+        first_token_timeout: float = MODEL_FIRST_TOKEN_TIMEOUT,
+    ):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.first_token_timeout = first_token_timeout
+        self.ttft: float | None = None
+        self._error = 0.0
+        self._error_at = time.monotonic()
+        self.calls = 0
+        self.failures = 0
+        # a few calls a minute, not hundreds: decide on a short window
+        self.breaker = CircuitBreaker(
+            window=10, min_calls=3, open_seconds=MODEL_BREAKER_OPEN_SECONDS,
+        )
+
+    def _ewma(self, current: float | None, sample: float) -> float:
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    @property
+    def error_rate(self) -> float:
+        idle = time.monotonic() - self._error_at
+        return self._error * 0.5 ** (idle / self.half_life)
+
+    def first_chunk(self, seconds: float):
+        self.ttft = self._ewma(self.ttft, seconds)
+
+    def outcome(self, ok: bool):
+        # failures only move the error rate: a model that is fast again after
+        # an outage wins back its traffic as soon as it answers
+        self.calls += 1
+        self.failures += not ok
+        self._error = self._ewma(self.error_rate, 0.0 if ok else 1.0)
+        self._error_at = time.monotonic()
+        self.breaker.record(ok)
+
+    def score(self) -> float:
+        """Expected seconds to a first token, counting failed attempts."""
+        ttft = self.ttft
+        if ttft is None:
+            if not self.failures:
+                return 0.0
+            # only failures so far: as slow as a first-token timeout
+            ttft = self.first_token_timeout
+        return ttft / max(1.0 - self.error_rate, 0.05)
+
+
+class RoutedLlm(BaseLlm):
+    """Routes each call to the best of `llms`, failing over before the first chunk."""
+
+    llms: list[BaseLlm]
+    race: bool = MODEL_RACE
+    first_token_timeout: float = MODEL_FIRST_TOKEN_TIMEOUT
+    explore_ratio: float = MODEL_EXPLORE_RATIO
+    health: dict[str, Any] = Field(default_factory=dict, exclude=True)
+
+    def __init__(self, llms: list[BaseLlm], **kwargs):
+        super().__init__(model="router/" + ",".join(llm.model for llm in llms), llms=llms, **kwargs)
+        self.health = {
+            llm.model: ModelHealth(first_token_timeout=self.first_token_timeout) for llm in llms
+        }
+
+    def ranked(self) -> list[BaseLlm]:
+        # sorted() is stable: configured order among equals
+        order = sorted(self.llms, key=lambda llm: self.health[llm.model].score())
+        if len(order) > 1 and random.random() < self.explore_ratio:
+            order[0], order[1] = order[1], order[0]
+        return order
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        width = 2 if self.race and stream and current_priority() == INTERACTIVE else 1
+        pending = self.ranked()
+        route = "first_choice"
+        last_error: BaseException | None = None
+        while True:
+            attempts = []
+            while pending and len(attempts) < width:
+                llm = pending.pop(0)
+                if self.health[llm.model].breaker.allow():
+                    attempts.append(llm)
+                else:
+                    MODEL_FAILURES.labels(llm.model, "breaker_open").inc()
+            if not attempts:
+                if last_error is not None:
+                    raise last_error
+                raise ModelError(f"{self.model}: every model is cooling down after failures")
+            try:
+                llm, chunks, first = await self._first_of(attempts, llm_request, stream)
+                break
+            except Exception as e:
+                last_error = e
+                route = "failover"
+        MODEL_ROUTED.labels(llm.model, "race" if len(attempts) > 1 else route).inc()
+
+        health = self.health[llm.model]
+        recorded = False
+        try:
+            yield _tagged(first, llm.model)
+            async for response in chunks:
+                yield _tagged(response, llm.model)
+        except Exception:
+            # too late to fail over: part of the answer is out
+            MODEL_FAILURES.labels(llm.model, "stream_error").inc()
+            health.outcome(False)
+            recorded = True
+            raise
+        else:
+            health.outcome(True)
+            recorded = True
+        finally:
+            if not recorded:
+                # the consumer stopped early: no verdict on the model
+                health.breaker.release()
+            await chunks.aclose()
+            self._export(llm.model)
+
+    async def _first_of(self, attempts: list[BaseLlm], llm_request: LlmRequest, stream: bool):
+        """(llm, generator, first response) of the attempt that produced a chunk first."""
+        if len(attempts) == 1:
+            return (attempts[0], *await self._first(attempts[0], llm_request, stream))
+        tasks = {
+            asyncio.ensure_future(self._first(llm, llm_request, stream)): llm for llm in attempts
+        }
+        winner = None
+        error = None
+        try:
+            while tasks and winner is None:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    llm = tasks.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = (llm, *task.result())
+                    else:
+                        # a dead heat: keep one stream
+                        chunks, _ = task.result()
+                        self.health[llm.model].breaker.release()
+                        await chunks.aclose()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if winner is None:
+            raise error
+        return winner
+
+    async def _first(self, llm: BaseLlm, llm_request: LlmRequest, stream: bool):
+        # LiteLlm appends to contents and sends llm_request.model, so each
+        # attempt gets its own request
+        request = llm_request.model_copy(update={"model": llm.model, "contents": list(llm_request.contents)})
+        health = self.health[llm.model]
+        chunks = llm.generate_content_async(request, stream=stream)
+        t0 = time.perf_counter()
+        try:
+            first = await asyncio.wait_for(anext(chunks), self.first_token_timeout)
+            if first.error_code:
+                raise ModelError(f"{llm.model}: {first.error_code} {first.error_message or ''}".strip())
+        except asyncio.CancelledError:
+            # lost the race
+            health.breaker.release()
+            await chunks.aclose()
+            raise
+        except (Exception, asyncio.TimeoutError) as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            MODEL_FAILURES.labels(llm.model, "timeout" if timed_out else "error").inc()
+            health.outcome(False)
+            self._export(llm.model)
+            await chunks.aclose()
+            if isinstance(e, StopAsyncIteration):
+                raise ModelError(f"{llm.model}: empty response") from None
+            raise
+        health.first_chunk(time.perf_counter() - t0)
+        return chunks, first
+
+    def _export(self, model: str):
+        health = self.health[model]
+        if health.ttft is not None:
+            MODEL_TTFT_EWMA.labels(model).set(health.ttft)
+        MODEL_ERROR_RATE.labels(model).set(health.error_rate)
+        BREAKER_OPEN.labels(model).set(health.breaker.state != CLOSED)
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "ttft_ewma_s": None if h.ttft is None else round(h.ttft, 3),
+                "error_rate": round(h.error_rate, 3),
+                "calls": h.calls,
+                "failures": h.failures,
+                "breaker": h.breaker.state,
+            }
+            for model, h in self.health.items()
+        }
+
+
+def _tagged(response: LlmResponse, model: str) -> LlmResponse:
+    # which model answered: for cost accounting (llm_cache.py) and logs
+    response.custom_metadata = {**(response.custom_metadata or {}), "model": model}
+    return response
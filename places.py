@@ -0,0 +1,150 @@
+import asyncio
+import os
+from typing import TypedDict
+
+from cache import make_cache
+from geo import haversine_m, tile_size_for_radius, tile_center, tile_radius_m, tiles_covering
+from metrics import STALE_SERVED
+from resilience import UpstreamError
+from upstream import get_json
+
+# -----------------------------------------------------
+#  Tile-cached Places Nearby Search
+# -----------------------------------------------------
+# Instead of searching the exact (lat, lng, radius) circle, every query is
+# answered from the grid tiles that cover it. Each tile is fetched once
+# (one Nearby Search around the tile centre, wide enough to cover the
+# whole tile) and cached, so requests a few hundred metres apart share
+# results and only the tiles nobody asked for yet cost an API call.
+
+PLACES_CACHE_SIZE = int(os.getenv("PLACES_CACHE_SIZE", "20000"))
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL", str(24 * 3600)))
+# tile side relative to the query radius; larger tiles = fewer tiles per
+# query but a wider (and therefore sparser) search per tile
+PLACES_TILE_FACTOR = float(os.getenv("PLACES_TILE_FACTOR", "2.0"))
+# Nearby Search never returns more than 20 results per call
+MAX_RESULTS = 20
+# nor searches a radius over 50 km: tiles stay small enough to fit in one
+NEARBY_MAX_RADIUS_M = 50000
+# how many places the slim payload hands back to the LLM
+PLACES_TOP_K = int(os.getenv("PLACES_TOP_K", "8"))
+
+NEARBY_PATH = "/maps/api/place/nearbysearch/json"
+
+tile_cache = make_cache("places_tiles", maxsize=PLACES_CACHE_SIZE, ttl=PLACES_CACHE_TTL)
+
+
+async def _fetch_tile(ix: int, iy: int, size: float, keyword: str, api_key: str) -> dict:
+    lat, lng = tile_center(ix, iy, size)
+    params = {
+        "location": f"{lat},{lng}",
+        "radius": min(round(tile_radius_m(iy, size)), NEARBY_MAX_RADIUS_M),
+        "keyword": keyword,
+        "key": api_key,
+    }
+    return await get_json("maps", NEARBY_PATH, params)
+
+
+async def nearby_search(lat: float, lng: float, radius: float, keyword: str, api_key: str) -> dict:
+    """
+    Nearby Search for the circle around (lat, lng), answered from cached
+    tiles. Returns the same payload shape as the Places API; results are
+    filtered to the exact circle and ordered by distance. While Places is
+    down expired tiles are used, status UPSTREAM_UNAVAILABLE without them.
+    """
+    size = tile_size_for_radius(radius, PLACES_TILE_FACTOR, NEARBY_MAX_RADIUS_M)
+    tiles = tiles_covering(lat, lng, radius, size)
+
+    keys = {f"{keyword}|{size}|{ix}|{iy}": (ix, iy) for ix, iy in tiles}
+    found = await tile_cache.aget_many(list(keys))
+    missing = [(key, ix, iy) for key, (ix, iy) in keys.items() if key not in found]
+
+    responses = await asyncio.gather(*(
+        _fetch_tile(ix, iy, size, keyword, api_key) for _, ix, iy in missing
+    ), return_exceptions=True)
+    for (key, _, _), resp in zip(missing, responses):
+        if isinstance(resp, UpstreamError):
+            # Places down: an expired tile beats no tile
+            stale = await tile_cache.aget_stale(key)
+            if stale is None:
+                return {"status": "UPSTREAM_UNAVAILABLE", "error_message": str(resp)}
+            STALE_SERVED.labels("places_tiles").inc()
+            found[key] = stale
+            continue
+        if isinstance(resp, BaseException):
+            raise resp
+        status = resp.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            # surface quota / auth errors exactly as the API reported them
+            return resp
+        found[key] = resp.get("results", [])
+        await tile_cache.aset(key, found[key])
+
+    seen = set()
+    ranked = []
+    for results in found.values():
+        for place in results:
+            pid = place.get("place_id")
+            if pid in seen:
+                continue
+            seen.add(pid)
+            loc = place.get("geometry", {}).get("location", {})
+            if "lat" not in loc or "lng" not in loc:
+                continue
+            dist = haversine_m(lat, lng, loc["lat"], loc["lng"])
+            if dist <= radius:
+                ranked.append((dist, place))
+
+    ranked.sort(key=lambda item: item[0])
+    results = [place for _, place in ranked[:MAX_RESULTS]]
+
+    return {
+        "html_attributions": [],
+        "results": results,
+        "status": "OK" if results else "ZERO_RESULTS",
+    }
+
+
+# -----------------------------------------------------
+#  Slim payloads for the LLM
+# -----------------------------------------------------
+# The raw Places result carries photos, plus_codes, icons, viewports ...
+# none of which the prompt uses, and all of which cost tokens on every
+# turn. Tools return these projections unless asked for verbose output.
+class PlaceSummary(TypedDict):
+    name: str | None
+    rating: float | None
+    location: dict
+    vicinity: str | None
+    open_now: bool | None
+    place_id: str | None
+
+
+def project_place(place: dict) -> PlaceSummary:
+    return {
+        "name": place.get("name"),
+        "rating": place.get("rating"),
+        "location": place.get("geometry", {}).get("location", {}),
+        "vicinity": place.get("vicinity"),
+        "open_now": place.get("opening_hours", {}).get("open_now"),
+        "place_id": place.get("place_id"),
+    }
+
+
+def slim_places(resp: dict, lat: float, lng: float, radius: float, top_k: int = PLACES_TOP_K) -> dict:
+    """
+    Top-k projected places, best rated first with a penalty of one star
+    for a place at the very edge of the search circle. Error payloads
+    are passed through untouched.
+    """
+    status = resp.get("status")
+    if status not in ("OK", "ZERO_RESULTS"):
+        return resp
+
+    def score(place):
+        loc = place["location"]
+        dist = haversine_m(lat, lng, loc["lat"], loc["lng"]) if loc else radius
+        return (place["rating"] or 0) - dist / max(radius, 1)
+
+    places = sorted((project_place(p) for p in resp.get("results", [])), key=score, reverse=True)
+    return {"status": status, "results": places[:top_k]}
@@ -0,0 +1,388 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from cache import CACHE_BACKEND, CACHE_PATH
+from metrics import QUOTA_SKIPPED, QUOTA_USED, RATE_LIMITED, RATE_LIMIT_WAIT
+from resilience import UpstreamError
+
+# -----------------------------------------------------
+#  Client-side rate limits and daily quotas
+# -----------------------------------------------------
+# Google answers bursts over the QPS quota with 429 / OVER_QUERY_LIMIT,
+# and a retry of those only makes it worse. Instead every upstream request
+# (first attempts, retries and hedges alike) takes a token from the
+# upstream's bucket first ({NAME}_QPS in upstream.py) and queues while
+# the bucket is empty:
+#
+# - the queue is ordered by priority: INTERACTIVE (the default) before
+#   BACKGROUND (optional work, `with background():`), FIFO within one
+#   priority. A request still queued after RATE_LIMIT_MAX_WAIT fails with
+#   UpstreamError("rate_limited"), so the tools' fallbacks take over.
+# - a 429 pauses the bucket for its Retry-After.
+# - RATE_LIMIT_BACKEND=sqlite (default: whatever CACHE_BACKEND is, so
+#   sqlite under serve.py) keeps the buckets in the cache file and every
+#   worker draws from the same tokens; priorities order the queue within
+#   one worker. The bucket row is read and written in a worker thread
+#   (atake / apause), so a worker waiting on another's write lock never
+#   stalls its event loop; the same goes for the quota counters
+#   (atry_consume / astats).
+#
+# Daily quotas (CSE: 100 queries a day on the free tier, reset at midnight
+# Pacific time) are counted the same way. The last `reserve` queries are
+# kept for interactive calls: background callers see the quota as used up
+# early and skip the optional call instead of failing later.
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND") or CACHE_BACKEND
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+# bucket size in seconds of traffic: small, so a burst cannot overrun a
+# quota enforced over a short window
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "0.2"))
+
+CSE_DAILY_QUOTA = int(os.getenv("CSE_DAILY_QUOTA", "100"))
+CSE_QUOTA_RESERVE = int(os.getenv("CSE_QUOTA_RESERVE", "10"))
+# Google's daily quotas roll over at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+INTERACTIVE, BACKGROUND = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def background():
+    """Upstream requests made inside yield to interactive ones."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+async def in_background(coro):
+    """Awaits coro at background priority (for gather() branches)."""
+    with background():
+        return await coro
+
+
+# ---------------- token buckets ----------------
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """0 when a token was taken, else seconds until the next one."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        with self._lock:
+            # several 429s for one overload pause once, not once each
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+    async def atake(self) -> float:
+        return self.take()
+
+    async def apause(self, seconds: float):
+        self.pause(seconds)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteTokenBucket:
+    """Same bucket, kept in a SQLite row so several processes share it."""
+
+    def __init__(self, path: str, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            " name TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO rate_limit VALUES (?, ?, ?)", (name, burst, time.time()),
+        )
+
+    def _update(self, change) -> float:
+        with self._lock:
+            # IMMEDIATE: read-modify-write under the database write lock
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self._conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit WHERE name = ?", (self.name,),
+                ).fetchone()
+                now = time.time()
+                tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                tokens, wait = change(tokens)
+                self._conn.execute(
+                    "UPDATE rate_limit SET tokens = ?, updated_at = ? WHERE name = ?",
+                    (tokens, now, self.name),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def take(self) -> float:
+        def change(tokens):
+            if tokens >= 1:
+                return tokens - 1, 0.0
+            return tokens, (1 - tokens) / self.rate
+        return self._update(change)
+
+    def pause(self, seconds: float):
+        self._update(lambda tokens: (min(tokens, -seconds * self.rate), 0.0))
+
+    async def atake(self) -> float:
+        return await asyncio.to_thread(self.take)
+
+    async def apause(self, seconds: float):
+        await asyncio.to_thread(self.pause, seconds)
+
+
+class RateLimiter:
+    """Priority queue in front of one upstream's token bucket."""
+
+    def __init__(self, name: str, bucket, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.name = name
+        self.bucket = bucket
+        self.max_wait = max_wait
+        self._waiters: list = []  # (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def acquire(self, priority: int | None = None):
+        priority = current_priority() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # a new event loop (tests, benchmarks): nothing queued carries over
+            self._loop, self._waiters, self._dispatcher = loop, [], None
+
+        if not self._waiters and await self.bucket.atake() == 0:
+            return
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            RATE_LIMITED.labels(self.name, PRIORITY_NAMES[priority]).inc()
+            raise UpstreamError(self.name, "rate_limited") from None
+        finally:
+            RATE_LIMIT_WAIT.labels(self.name, PRIORITY_NAMES[priority]).observe(time.monotonic() - t0)
+
+    async def _dispatch(self):
+        while self._waiters:
+            if self._waiters[0][2].done():
+                # timed out or cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = await self.bucket.atake()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            # the head may have changed while the token was taken
+            while self._waiters:
+                future = heapq.heappop(self._waiters)[2]
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+    async def pause(self, seconds: float):
+        await self.bucket.apause(seconds)
+
+    def queued(self) -> int:
+        return sum(not f.done() for _, _, f in self._waiters)
+
+
+class Unlimited:
+    """qps <= 0: no client-side limit."""
+
+    async def acquire(self, priority: int | None = None):
+        pass
+
+    async def pause(self, seconds: float):
+        pass
+
+
+_limiters: dict[str, RateLimiter | Unlimited] = {}
+
+
+def limiter(name: str, qps: float, backend: str | None = None) -> RateLimiter | Unlimited:
+    rl = _limiters.get(name)
+    if rl is None and qps <= 0:
+        rl = _limiters[name] = Unlimited()
+    elif rl is None:
+        backend = backend or RATE_LIMIT_BACKEND
+        burst = max(1.0, qps * RATE_LIMIT_BURST_SECONDS)
+        if backend == "sqlite":
+            bucket = SQLiteTokenBucket(CACHE_PATH, name, qps, burst)
+        elif backend == "memory":
+            bucket = TokenBucket(qps, burst)
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+        rl = _limiters[name] = RateLimiter(name, bucket)
+    return rl
+
+
+# ---------------- daily quotas ----------------
+
+def quota_day() -> str:
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+
+class DailyQuota:
+    def __init__(self, name: str, limit: int, reserve: int = 0):
+        self.name = name
+        self.limit = limit
+        self.reserve = reserve
+        self._day = quota_day()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _ceiling(self, priority: int) -> int:
+        return self.limit - (self.reserve if priority == BACKGROUND else 0)
+
+    def try_consume(self, priority: int | None = None) -> bool:
+        """
+        Counts one query if the quota allows it at this priority; False
+        means skip the call (background callers stop `reserve` early).
+        """
+        priority = current_priority() if priority is None else priority
+        with self._lock:
+            day = quota_day()
+            if day != self._day:
+                self._day, self._used = day, 0
+            ok = self._used < self._ceiling(priority)
+            if ok:
+                self._used += 1
+            used = self._used
+        self._report(ok, used)
+        return ok
+
+    def used(self) -> int:
+        with self._lock:
+            return self._used if self._day == quota_day() else 0
+
+    def _report(self, ok: bool, used: int):
+        QUOTA_USED.labels(self.name).set(used)
+        if not ok:
+            QUOTA_SKIPPED.labels(self.name).inc()
+
+    def stats(self) -> dict:
+        used = self.used()
+        return {"limit": self.limit, "used": used, "remaining": max(0, self.limit - used), "reserve": self.reserve}
+
+    async def atry_consume(self, priority: int | None = None) -> bool:
+        return self.try_consume(priority)
+
+    async def astats(self) -> dict:
+        return self.stats()
+
+
+class SQLiteDailyQuota(DailyQuota):
+    """Same quota, counted in the cache file so every worker sees one total."""
+
+    def __init__(self, path: str, name: str, limit: int, reserve: int = 0):
+        super().__init__(name, limit, reserve)
+        self._conn = _connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_usage ("
+            " name TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " used INTEGER NOT NULL,"
+            " PRIMARY KEY (name, day))"
+        )
+
+    def try_consume(self, priority: int | None = None) -> bool:
+        priority = current_priority() if priority is None else priority
+        day = quota_day()
+        with self._lock:
+            # one statement: the counter only moves while under the ceiling
+            cur = self._conn.execute(
+                "INSERT INTO quota_usage SELECT ?, ?, 1 WHERE ? > 0"
+                " ON CONFLICT (name, day) DO UPDATE SET used = used + 1 WHERE used < ?",
+                (self.name, day, self._ceiling(priority), self._ceiling(priority)),
+            )
+            ok = cur.rowcount > 0
+        used = self.used()
+        self._report(ok, used)
+        return ok
+
+    def used(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT used FROM quota_usage WHERE name = ? AND day = ?", (self.name, quota_day()),
+            ).fetchone()
+        return row[0] if row else 0
+
+    async def atry_consume(self, priority: int | None = None) -> bool:
+        # the caller's priority, not the worker thread's
+        priority = current_priority() if priority is None else priority
+        return await asyncio.to_thread(self.try_consume, priority)
+
+    async def astats(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+
+def make_quota(name: str, limit: int, reserve: int = 0, backend: str | None = None) -> DailyQuota:
+    backend = backend or RATE_LIMIT_BACKEND
+    if backend == "sqlite":
+        return SQLiteDailyQuota(CACHE_PATH, name, limit, reserve)
+    if backend == "memory":
+        return DailyQuota(name, limit, reserve)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+def reset_rate_limits():
+    """Forget every limiter; the next request rebuilds it from the current qps."""
+    _limiters.clear()
+
+
+def rate_limit_stats() -> dict:
+    return {
+        name: {"qps": rl.bucket.rate, "queued": rl.queued()}
+        for name, rl in _limiters.items() if isinstance(rl, RateLimiter)
+    }
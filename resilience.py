@@ -0,0 +1,290 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+import httpx
+
+from metrics import BREAKER_OPEN, UPSTREAM_HEDGES, UPSTREAM_REJECTED, UPSTREAM_RETRIES
+
+# -----------------------------------------------------
+#  Upstream resilience: breaker, retries, hedging
+# -----------------------------------------------------
+# Every get_json goes through policy.call():
+#
+# - circuit breaker per upstream: once half of the last BREAKER_WINDOW
+#   requests failed (5xx, 429, timeout, connection error) the upstream is
+#   skipped for BREAKER_OPEN_SECONDS, then a single probe decides whether
+#   it closes again. While open, calls fail fast with UpstreamError and
+#   the tools fall back to stale cache entries instead of piling up.
+# - retries with full-jitter exponential backoff, paid from one global
+#   budget: retries may add at most RETRY_BUDGET_RATIO extra requests on
+#   top of the first attempts, so a slow upstream is not hammered by a
+#   retry storm. No retry starts past RETRY_DEADLINE.
+# - hedging (HEDGE_UPSTREAMS, default only the free Open-Meteo): when the
+#   first request has not answered after the upstream's recent p95, a
+#   second one is sent and the first answer wins. Hedges have their own
+#   budget (HEDGE_BUDGET_RATIO), so a brownout's retries cannot starve
+#   them exactly when the tail is worst.
+#
+# UPSTREAM_RESILIENCE=off sends every request exactly once (failures
+# still raise UpstreamError).
+
+RESILIENCE_ENABLED = os.getenv("UPSTREAM_RESILIENCE", "on") != "off"
+
+# wide enough that a 20% error rate does not open it by chance
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "50"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "20"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+
+RETRY_MAX = int(os.getenv("RETRY_MAX", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2.0"))
+RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "15"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+# tokens to start with (and the cap), so a quiet process can still retry
+RETRY_BUDGET_RESERVE = float(os.getenv("RETRY_BUDGET_RESERVE", "10"))
+
+HEDGE_UPSTREAMS = frozenset(filter(None, os.getenv("HEDGE_UPSTREAMS", "weather").split(",")))
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamError(Exception):
+    """The upstream could not answer: breaker open, or every attempt failed."""
+
+    def __init__(self, upstream: str, status: str, message: str = ""):
+        super().__init__(f"{upstream}: {status}" + (f" ({message})" if message else ""))
+        self.upstream = upstream
+        self.status = status
+        self.message = message
+
+
+def _failed(resp: httpx.Response) -> bool:
+    return resp.status_code >= 500 or resp.status_code == 429
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+    ):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # exactly one probe at a time
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, ok: bool):
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self.state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+        self._outcomes.append(not ok)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) >= self.failure_ratio * len(self._outcomes)
+        ):
+            self._open()
+
+    def release(self):
+        """A probe that ended without an outcome (cancelled, unexpected error)."""
+        self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class RetryBudget:
+    """Every first attempt earns `ratio` tokens; a retry (or hedge) costs one."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, reserve: float = RETRY_BUDGET_RESERVE):
+        self.ratio = ratio
+        self.cap = reserve
+        self.tokens = reserve
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+Attempt = Callable[[], Awaitable[httpx.Response]]
+
+
+class Resilience:
+    def __init__(self, enabled: bool = RESILIENCE_ENABLED, hedge: frozenset = HEDGE_UPSTREAMS):
+        self.reset(enabled, hedge)
+
+    def reset(self, enabled: bool = RESILIENCE_ENABLED, hedge: frozenset = HEDGE_UPSTREAMS):
+        self.enabled = enabled
+        self.hedge = frozenset(hedge)
+        self.budget = RetryBudget()
+        self.hedge_budget = RetryBudget(HEDGE_BUDGET_RATIO)
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latency: dict[str, LatencyWindow] = {}
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        breaker = self._breakers.get(upstream)
+        if breaker is None:
+            breaker = self._breakers[upstream] = CircuitBreaker()
+        return breaker
+
+    async def call(self, upstream: str, attempt: Attempt) -> httpx.Response:
+        """
+        Response of the first successful attempt. Raises UpstreamError when
+        the breaker is open or the last attempt still failed.
+        """
+        if not self.enabled:
+            try:
+                resp = await attempt()
+            except httpx.TransportError as e:
+                raise UpstreamError(upstream, type(e).__name__) from e
+            if _failed(resp):
+                raise UpstreamError(upstream, str(resp.status_code))
+            return resp
+
+        breaker = self.breaker(upstream)
+        if not breaker.allow():
+            UPSTREAM_REJECTED.labels(upstream).inc()
+            raise UpstreamError(upstream, "circuit_open")
+        self.budget.deposit()
+
+        started = time.monotonic()
+        for n in range(RETRY_MAX + 1):
+            if n:
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** n))
+                if time.monotonic() - started + delay > RETRY_DEADLINE:
+                    break
+                if not self.budget.withdraw():
+                    break
+                await asyncio.sleep(delay)
+                # opened meanwhile (or a half-open probe is out): stop here
+                if not breaker.allow():
+                    break
+                UPSTREAM_RETRIES.labels(upstream).inc()
+            try:
+                resp = await self._attempt(upstream, attempt)
+            except httpx.TransportError as e:
+                ok, failure = False, type(e).__name__
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                ok = not _failed(resp)
+                if not ok:
+                    failure = str(resp.status_code)
+            breaker.record(ok)
+            BREAKER_OPEN.labels(upstream).set(breaker.state != CLOSED)
+            if ok:
+                return resp
+        raise UpstreamError(upstream, failure)
+
+    async def _attempt(self, upstream: str, attempt: Attempt) -> httpx.Response:
+        window = self._latency.get(upstream)
+        if window is None:
+            window = self._latency[upstream] = LatencyWindow()
+
+        async def timed():
+            t0 = time.monotonic()
+            resp = await attempt()
+            if not _failed(resp):
+                window.add(time.monotonic() - t0)
+            return resp
+
+        if upstream not in self.hedge:
+            return await timed()
+        self.hedge_budget.deposit()
+        after = window.quantile(HEDGE_QUANTILE)
+        if after is None:
+            return await timed()
+
+        first = asyncio.ensure_future(timed())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(after, HEDGE_MIN_DELAY))
+            if done or not self.hedge_budget.withdraw():
+                return await first
+            tasks.append(asyncio.ensure_future(timed()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not _failed(task.result()):
+                        UPSTREAM_HEDGES.labels(upstream, "won" if task is not first else "lost").inc()
+                        return task.result()
+            UPSTREAM_HEDGES.labels(upstream, "failed").inc()
+            # both failed: report the first one's outcome
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "budget_exhausted": self.budget.exhausted,
+            "hedge_tokens": round(self.hedge_budget.tokens, 2),
+            "hedge_budget_exhausted": self.hedge_budget.exhausted,
+            "breakers": {
+                name: {"state": b.state, "opened": b.opened}
+                for name, b in self._breakers.items()
+            },
+        }
+
+
+policy = Resilience()
@@ -0,0 +1,126 @@
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import time
+from typing import Callable
+
+import uvicorn
+
+# -----------------------------------------------------
+#  Multi-worker serve mode for the MCP server
+# -----------------------------------------------------
+#   python serve.py --workers 4 --port 5003
+#
+# - every worker binds its own SO_REUSEPORT socket, so the kernel spreads
+#   connections across them
+# - the MCP endpoint runs stateless (no per-process MCP session), so any
+#   worker can answer any request, and answers with plain JSON rather than
+#   an SSE stream (SSE responses are cut as soon as uvicorn starts to shut
+#   down, which would defeat the drain)
+# - workers default to CACHE_BACKEND=sqlite: directions / places / weather
+#   caches live in one WAL file that all workers read and fill
+# - SIGTERM / Ctrl-C drains: /ready turns 503, the sockets stop accepting,
+#   in-flight requests get SERVE_DRAIN_SECONDS to finish
+# - a worker that dies unexpectedly is restarted
+# - with PROMETHEUS_MULTIPROC_DIR set, /metrics on any worker reports the
+#   totals of all of them (see metrics.py)
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "5003"))
+SERVE_DRAIN_SECONDS = float(os.getenv("SERVE_DRAIN_SECONDS", "30"))
+# a worker that dies this soon after starting is crash-looping
+# (bad config, missing key ...): wait this long before the restart
+SERVE_RESTART_BACKOFF = 1.0
+
+
+def reuseport_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+class DrainingServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, on_drain: Callable[[], None]):
+        super().__init__(config)
+        self._on_drain = on_drain
+
+    def handle_exit(self, sig, frame):
+        # flip readiness first so the balancer stops routing here
+        self._on_drain()
+        super().handle_exit(sig, frame)
+
+
+def run_worker(host: str, port: int, drain: float):
+    # before server.py is imported: its caches are built at import time
+    os.environ.setdefault("CACHE_BACKEND", "sqlite")
+    import server
+
+    config = uvicorn.Config(
+        server.app.http_app(stateless_http=True, json_response=True),
+        timeout_graceful_shutdown=drain,
+        log_level="warning",
+    )
+    sock = reuseport_socket(host, port)
+    DrainingServer(config, server.begin_drain).run(sockets=[sock])
+
+
+def serve(
+    workers: int = SERVE_WORKERS,
+    host: str = SERVE_HOST,
+    port: int = SERVE_PORT,
+    drain: float = SERVE_DRAIN_SECONDS,
+):
+    """Runs `workers` worker processes until SIGTERM / SIGINT."""
+    procs: dict[int, multiprocessing.Process] = {}
+    started: dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        proc = multiprocessing.Process(target=run_worker, args=(host, port, drain))
+        proc.start()
+        procs[proc.sentinel] = proc
+        started[proc.sentinel] = time.monotonic()
+
+    def stop(sig, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in procs.values():
+            if proc.is_alive():
+                # uvicorn drains on SIGTERM
+                proc.terminate()
+
+    for _ in range(max(workers, 1)):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"[serve] {len(procs)} workers on http://{host}:{port}/mcp")
+
+    while procs:
+        for sentinel in multiprocessing.connection.wait(list(procs)):
+            proc = procs.pop(sentinel)
+            proc.join()
+            if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+                from prometheus_client import multiprocess
+                # drop the dead worker's live gauges (in-flight counts)
+                multiprocess.mark_process_dead(proc.pid)
+            if not stopping:
+                print(f"[serve] worker {proc.pid} exited ({proc.exitcode}), restarting")
+                if time.monotonic() - started.pop(sentinel) < SERVE_RESTART_BACKOFF:
+                    time.sleep(SERVE_RESTART_BACKOFF)
+                spawn()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--drain", type=float, default=SERVE_DRAIN_SECONDS)
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port, args.drain)
@@ -1,16 +1,32 @@
 import os
 import httpx
 from fastmcp import FastMCP
+from starlette.responses import JSONResponse, Response
 from dotenv import load_dotenv
 import urllib.parse
 import asyncio
+import hashlib
+import json
+import math
+from contextlib import asynccontextmanager
 load_dotenv()
+from upstream import UPSTREAMS, get_client, close_client, get_json
+from metrics import instrument_tool, metrics_response, STALE_SERVED
+from ratelimit import CSE_DAILY_QUOTA, CSE_QUOTA_RESERVE, in_background, make_quota, rate_limit_stats
+from resilience import UpstreamError
+from tracing import setup_tracing, shutdown_tracing, trace_tool
+from cache import make_cache, cache_stats
+from places import nearby_search, slim_places, project_place, PLACES_TOP_K
+from geo import decode_polyline, resample_route, distance_to_route_m
+import numpy as np
 # -----------------------------------------------------
 #  ENV VARS
 # -----------------------------------------------------
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
 GOOGLE_CSE_KEY = os.getenv("GOOGLE_CSE_KEY")
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "2048"))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", str(6 * 3600)))
 # Validate
 if not GOOGLE_MAPS_API_KEY:
     raise RuntimeError("GOOGLE_MAPS_API_KEY missing in environment")
@@ -19,11 +35,64 @@ if not GOOGLE_MAPS_API_KEY:
 # -----------------------------------------------------
 #  Create MCP Server
 # -----------------------------------------------------
-app = FastMCP("sentient-roadtrip-mcp")
+# readiness for load balancers (GET /ready): up once the lifespan has
+# started, down again as soon as a drain begins (see serve.py)
+_ready = False
+
+
+def begin_drain():
+    global _ready
+    _ready = False
+
+
+@asynccontextmanager
+async def lifespan(server):
+    global _ready
+    # open the pooled upstream client once, close it on shutdown
+    get_client()
+    setup_tracing("roadtrip-mcp")
+    _ready = True
+    try:
+        yield
+    finally:
+        _ready = False
+        await close_client()
+        shutdown_tracing()
+
+
+app = FastMCP("sentient-roadtrip-mcp", lifespan=lifespan)
+
+route_cache = make_cache("directions", maxsize=ROUTE_CACHE_SIZE, ttl=ROUTE_CACHE_TTL)
+# route key -> in-flight Directions request, so parallel tool calls for the
+# same corridor (plan_route, stops, weather) share one upstream call
+_directions_inflight: dict[str, asyncio.Task] = {}
+
+
+@app.custom_route("/ready", methods=["GET"])
+async def ready_endpoint(request):
+    return JSONResponse({"ready": _ready, "pid": os.getpid()}, status_code=200 if _ready else 503)
+
+
+@app.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request):
+    return metrics_response()
+
+
+@app.custom_route("/cache/stats", methods=["GET"])
+async def cache_stats_endpoint(request):
+    return JSONResponse(cache_stats())
+
+
+@app.custom_route("/limits/stats", methods=["GET"])
+async def limits_stats_endpoint(request):
+    return JSONResponse({"rate_limits": rate_limit_stats(), "quotas": {"cse": await cse_quota.astats()}})
+
 # -----------------------------------------------------
 #  1. Mood Analyzer
 # -----------------------------------------------------
 @app.tool()
+@instrument_tool
+@trace_tool
 def analyze_roadtrip_mood(input: dict):
     print("analyzing sentiment..")
     mood = input.get("mood", "").lower()
@@ -56,40 +125,101 @@ def analyze_roadtrip_mood(input: dict):
 # -----------------------------------------------------
 #  2. Route Planner (Google Directions API)
 # -----------------------------------------------------
-@app.tool()
-def plan_route(input: dict):
-    print("planning route ...")
-    origin = input["origin"]
-    destination = input["destination"]
+def _place_key(place: str) -> str:
+    # "Bangalore ,  Karnataka" and "bangalore, karnataka" are the same trip
+    return ",".join(" ".join(p.split()) for p in place.casefold().split(","))
+
+
+async def fetch_directions(origin: str, destination: str, mode: str = "driving"):
+    """
+    Returns the first leg of the Directions result (plus the overview
+    polyline), served from route_cache when the corridor was seen recently.
+    None when Google has no route. While Directions is down an expired
+    entry is served marked "stale"; without one, UpstreamError propagates.
+    """
+    key = f"{_place_key(origin)}|{_place_key(destination)}|{mode}"
+    route = await route_cache.aget(key)
+    if route is not None:
+        return route
+
+    task = _directions_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_request_directions(key, origin, destination, mode))
+        _directions_inflight[key] = task
+        task.add_done_callback(lambda _: _directions_inflight.pop(key, None))
+    try:
+        # shield: one cancelled tool call must not cancel the shared request
+        return await asyncio.shield(task)
+    except UpstreamError:
+        stale = await route_cache.aget_stale(key)
+        if stale is None:
+            raise
+        STALE_SERVED.labels("directions").inc()
+        return {**stale, "stale": True}
+
 
-    url = "https://maps.googleapis.com/maps/api/directions/json"
+async def _request_directions(key: str, origin: str, destination: str, mode: str):
     params = {
         "origin": origin,
         "destination": destination,
-        "mode": "driving",
+        "mode": mode,
         "key": GOOGLE_MAPS_API_KEY
     }
 
-    resp = httpx.get(url, params=params).json()
+    resp = await get_json("maps", "/maps/api/directions/json", params)
 
+    status = resp.get("status", "OK")
+    if status not in ("OK", "ZERO_RESULTS", "NOT_FOUND"):
+        # quota / auth / UNKNOWN_ERROR: not an answer about the route
+        raise UpstreamError("maps", status, resp.get("error_message", ""))
     if not resp.get("routes"):
-        return {"error": "Unable to find route"}
+        return None
 
     leg = resp["routes"][0]["legs"][0]
+    route = {
+        "distance_m": leg["distance"]["value"],
+        "duration_s": leg["duration"]["value"],
+        "start_location": leg["start_location"],
+        "end_location": leg["end_location"],
+        "polyline": resp["routes"][0].get("overview_polyline", {}).get("points"),
+    }
+    await route_cache.aset(key, route)
+    return route
 
-    return {
+
+@app.tool()
+@instrument_tool
+@trace_tool
+async def plan_route(input: dict):
+    print("planning route ...")
+    origin = input["origin"]
+    destination = input["destination"]
+
+    try:
+        route = await fetch_directions(origin, destination)
+    except UpstreamError as e:
+        return {"error": "Directions unavailable", "status": e.status}
+
+    if route is None:
+        return {"error": "Unable to find route"}
+
+    result = {
         "origin": origin,
         "destination": destination,
-        "distance_km": leg["distance"]["value"] / 1000,
-        "duration_hours": leg["duration"]["value"] / 3600,
-        "start_location": leg["start_location"],
-        "end_location": leg["end_location"],
-       # "polyline": resp["routes"][0]["overview_polyline"]["points"]
+        "distance_km": route["distance_m"] / 1000,
+        "duration_hours": route["duration_s"] / 3600,
+        "start_location": route["start_location"],
+        "end_location": route["end_location"],
     }
+    if route.get("stale"):
+        result["stale"] = True
+    return result
 # -----------------------------------------------------
 #  3. Fuel Cost Estimator
 # -----------------------------------------------------
 @app.tool()
+@instrument_tool
+@trace_tool
 def estimate_fuel_cost(input: dict):
     print("estimating fuel cost....")
     dist = input["distance_km"]
@@ -108,59 +238,60 @@ def estimate_fuel_cost(input: dict):
 # -----------------------------------------------------
 #  4. Scenic Spots (Google Places API)
 # -----------------------------------------------------
+SCENIC_KEYWORD = "scenic viewpoint OR waterfall OR lake OR forest"
+FOOD_KEYWORD = "highway cafe OR dhaba OR restaurant OR tea stall"
+
 @app.tool()
-def find_scenic_spots(input: dict):
+@instrument_tool
+@trace_tool
+async def find_scenic_spots(input: dict):
     print("finding scenic stops on the way...")
     lat = input["lat"]
     lng = input["lng"]
     radius = input.get("radius", 8000)
 
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-    params = {
-        "location": f"{lat},{lng}",
-        "radius": radius,
-        "keyword": "scenic viewpoint OR waterfall OR lake OR forest",
-        "key": GOOGLE_MAPS_API_KEY
-    }
-
-    return httpx.get(url, params=params).json()
+    resp = await nearby_search(lat, lng, radius, SCENIC_KEYWORD, GOOGLE_MAPS_API_KEY)
+    if input.get("verbose"):
+        return resp
+    return slim_places(resp, lat, lng, radius, input.get("top_k", PLACES_TOP_K))
 
 # -----------------------------------------------------
 #  5. Food / Rest Stops (Google Places API)
 # -----------------------------------------------------
 @app.tool()
-def find_food_rest_stops(input: dict):
+@instrument_tool
+@trace_tool
+async def find_food_rest_stops(input: dict):
     print("finding something to eat...")
     lat = input["lat"]
     lng = input["lng"]
 
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-    params = {
-        "location": f"{lat},{lng}",
-        "radius": 2000,
-        "keyword": "highway cafe OR dhaba OR restaurant OR tea stall",
-        "key": GOOGLE_MAPS_API_KEY
-    }
-
-    return httpx.get(url, params=params).json()
+    resp = await nearby_search(lat, lng, 2000, FOOD_KEYWORD, GOOGLE_MAPS_API_KEY)
+    if input.get("verbose"):
+        return resp
+    return slim_places(resp, lat, lng, 2000, input.get("top_k", PLACES_TOP_K))
 
 # -----------------------------------------------------
 #  6. Weather (Open-Meteo, free)
 # -----------------------------------------------------
 @app.tool()
-def get_weather_on_route(input: dict):
+@instrument_tool
+@trace_tool
+async def get_weather_on_route(input: dict):
     print("clothes to bring....")
     lat = input["lat"]
     lng = input["lng"]
 
-    url = "https://api.open-meteo.com/v1/forecast"
     params = {
         "latitude": lat,
         "longitude": lng,
         "current": "temperature_2m,weather_code"
     }
 
-    return httpx.get(url, params=params).json()
+    try:
+        return await get_json("weather", "/v1/forecast", params)
+    except UpstreamError as e:
+        return {"error": "Weather unavailable", "status": e.status}
 
 # -----------------------------------------------------
 #  7. Image Search (DuckDuckGo, free)
@@ -190,8 +321,14 @@ def search_images(input: dict):
 # -----------------------------------------------------
 #  8. Trip Memory Image Generator (Pollinations SDXL)
 # -----------------------------------------------------
+# CSE's free tier is 100 queries a day; real_images is the optional part
+# of the answer, so it is left empty once the quota runs low.
+cse_quota = make_quota("cse", CSE_DAILY_QUOTA, reserve=CSE_QUOTA_RESERVE)
+
 @app.tool()
-def generate_trip_media(input: dict):
+@instrument_tool
+@trace_tool
+async def generate_trip_media(input: dict):
     print("generating trip media...")
     destination = input["destination"]
     style = input.get("style", "cinematic landscape")
@@ -205,14 +342,14 @@ def generate_trip_media(input: dict):
         "safe": "active"
     }
 
-    cse_url = "https://www.googleapis.com/customsearch/v1"
-
     real_images = []
     cse_raw = None
 
     try:
-        resp = httpx.get(cse_url, params=cse_params, timeout=10)
-        cse_raw = resp.json()
+        if not await cse_quota.atry_consume():
+            # keep the last queries of the day for direct requests
+            raise UpstreamError("cse", "daily_quota")
+        cse_raw = await get_json("cse", "/customsearch/v1", cse_params)
 
         if "items" in cse_raw:
             real_images = [
@@ -235,7 +372,7 @@ def generate_trip_media(input: dict):
 
     encoded_prompt = urllib.parse.quote(ai_prompt)
 
-    ai_image_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}"
+    ai_image_url = f"{UPSTREAMS['pollinations']['base_url']}/prompt/{encoded_prompt}"
 
     print("AI URL---->",ai_image_url)
     return {
@@ -249,6 +386,8 @@ def generate_trip_media(input: dict):
 #  9. Itinerary Generator
 # -----------------------------------------------------
 @app.tool()
+@instrument_tool
+@trace_tool
 def generate_roadtrip_itinerary(input: dict):
     print("generating the plan...")
     dest = input["destination"]
@@ -272,6 +411,8 @@ def generate_roadtrip_itinerary(input: dict):
 #  10. Context Enhancer
 # -----------------------------------------------------
 @app.tool()
+@instrument_tool
+@trace_tool
 def enhance_destination_context(input: dict):
     print("Final enhancements going on....")
     dest = input["destination"]
@@ -284,6 +425,333 @@ def enhance_destination_context(input: dict):
         "warnings": ["Fog in early mornings", "Refuel before remote roads"]
     }
 
+
+# -----------------------------------------------------
+#  11. Stops Along Route (Directions polyline + Places)
+# -----------------------------------------------------
+STOP_KINDS = {
+    "scenic": (SCENIC_KEYWORD, 8000),
+    "food": (FOOD_KEYWORD, 2000),
+}
+# upper bound on Places fan-out per call; long drives get wider spacing
+MAX_ROUTE_SAMPLES = 10
+
+
+def _not_positive(name: str, value, integer: bool = False) -> dict | None:
+    """The tool's error payload unless value is a positive number (int if integer)."""
+    # bool is an int subclass: True must not pass as 1
+    ok = (
+        not isinstance(value, bool)
+        and isinstance(value, int if integer else (int, float))
+        and math.isfinite(value)
+        and value > 0
+    )
+    if ok:
+        return None
+    return {"error": f"{name} must be a positive {'integer' if integer else 'number'}, got {value!r}"}
+
+
+async def route_coords(input: dict):
+    """Route geometry from an encoded "polyline" or an origin/destination pair."""
+    if input.get("polyline"):
+        return decode_polyline(input["polyline"])
+    route = await fetch_directions(input["origin"], input["destination"])
+    if route is None or not route.get("polyline"):
+        return None
+    return decode_polyline(route["polyline"])
+
+
+@app.tool()
+@instrument_tool
+@trace_tool
+async def find_stops_along_route(input: dict):
+    print("finding stops along the route...")
+    kind = input.get("kind", "scenic")
+    if kind not in STOP_KINDS:
+        return {"error": f"Unknown kind '{kind}', expected one of {sorted(STOP_KINDS)}"}
+    keyword, radius = STOP_KINDS[kind]
+    radius = input.get("radius", radius)
+    every_km = input.get("every_km", 25)
+    top_k = input.get("top_k", PLACES_TOP_K)
+    error = (
+        _not_positive("radius", radius)
+        or _not_positive("every_km", every_km)
+        or _not_positive("top_k", top_k, integer=True)
+    )
+    if error:
+        return error
+
+    try:
+        coords = await route_coords(input)
+    except UpstreamError as e:
+        return {"error": "Directions unavailable", "status": e.status}
+    if coords is None or len(coords) == 0:
+        return {"error": "Unable to find route"}
+
+    samples = resample_route(coords, every_km * 1000)
+    if len(samples) > MAX_ROUTE_SAMPLES:
+        keep = np.linspace(0, len(samples) - 1, MAX_ROUTE_SAMPLES).round().astype(int)
+        samples = samples[keep]
+
+    responses = await asyncio.gather(*(
+        nearby_search(lat, lng, radius, keyword, GOOGLE_MAPS_API_KEY)
+        for lat, lng in samples.tolist()
+    ))
+
+    places = {}
+    for resp in responses:
+        for place in resp.get("results", []):
+            places.setdefault(place.get("place_id"), place)
+
+    if not places:
+        errors = [r["status"] for r in responses if r.get("status") not in ("OK", "ZERO_RESULTS")]
+        if errors:
+            return {"error": f"Places search failed: {errors[0]}"}
+        return {"kind": kind, "samples": len(samples), "stops": []}
+
+    points = np.array([
+        [p["geometry"]["location"]["lat"], p["geometry"]["location"]["lng"]]
+        for p in places.values()
+    ])
+    off_route, along = distance_to_route_m(points, coords)
+
+    stops = []
+    for place, off_m, along_m in zip(places.values(), off_route.tolist(), along.tolist()):
+        stops.append({
+            **project_place(place),
+            # out to the stop and back onto the route
+            "detour_km": round(2 * off_m / 1000, 2),
+            "km_along_route": round(along_m / 1000, 1),
+        })
+    stops.sort(key=lambda s: (s["detour_km"], -(s["rating"] or 0)))
+
+    return {"kind": kind, "samples": len(samples), "stops": stops[:top_k]}
+
+
+
+# -----------------------------------------------------
+#  12. Weather Along Route (Open-Meteo, multi-location)
+# -----------------------------------------------------
+# Waypoints are snapped to a coarse grid; each cell is cached for a short
+# TTL and all uncached cells go out in ONE Open-Meteo request.
+WEATHER_CELL_DEG = 0.1
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "900"))
+MAX_WEATHER_POINTS = 50
+
+weather_cache = make_cache("weather_cells", maxsize=4096, ttl=WEATHER_CACHE_TTL)
+
+
+def _weather_cell(lat: float, lng: float):
+    return (
+        round(round(lat / WEATHER_CELL_DEG) * WEATHER_CELL_DEG, 4),
+        round(round(lng / WEATHER_CELL_DEG) * WEATHER_CELL_DEG, 4),
+    )
+
+
+def _weather_points(coordinates):
+    """(n, 2) array of the given (lat, lng) points; None if any is malformed."""
+    if not isinstance(coordinates, list) or not coordinates:
+        return None
+    points = []
+    for p in coordinates:
+        if isinstance(p, dict):
+            p = [p.get("lat"), p.get("lng")]
+        if not isinstance(p, (list, tuple)) or len(p) < 2:
+            return None
+        lat, lng = p[:2]
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lat, lng)):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return None
+        points.append([lat, lng])
+    return np.array(points, dtype=float)
+
+
+@app.tool()
+@instrument_tool
+@trace_tool
+async def get_weather_along_route(input: dict):
+    print("checking the weather all the way...")
+    if "coordinates" in input:
+        points = _weather_points(input["coordinates"])
+        if points is None:
+            return {"error": "coordinates must be a non-empty list of {lat, lng} or [lat, lng] points"}
+    else:
+        every_km = input.get("every_km", 50)
+        error = _not_positive("every_km", every_km)
+        if error:
+            return error
+        if not input.get("polyline") and not (input.get("origin") and input.get("destination")):
+            return {"error": "Pass coordinates, a polyline, or an origin and a destination"}
+        try:
+            coords = await route_coords(input)
+        except UpstreamError as e:
+            return {"error": "Directions unavailable", "status": e.status}
+        if coords is None or len(coords) == 0:
+            return {"error": "Unable to find route"}
+        points = resample_route(coords, every_km * 1000)
+
+    if len(points) > MAX_WEATHER_POINTS:
+        keep = np.linspace(0, len(points) - 1, MAX_WEATHER_POINTS).round().astype(int)
+        points = points[keep]
+
+    cells = [_weather_cell(lat, lng) for lat, lng in points.tolist()]
+    keys = {f"{cell[0]}|{cell[1]}": cell for cell in cells}
+    cached = await weather_cache.aget_many(list(keys))
+    current = {cell: cached[key] for key, cell in keys.items() if key in cached}
+    missing = [cell for key, cell in keys.items() if key not in cached]
+
+    stale = False
+    if missing:
+        params = {
+            "latitude": ",".join(str(lat) for lat, _ in missing),
+            "longitude": ",".join(str(lng) for _, lng in missing),
+            "current": "temperature_2m,weather_code"
+        }
+        try:
+            resp = await get_json("weather", "/v1/forecast", params)
+        except UpstreamError as e:
+            # Open-Meteo down: last known conditions, if every cell has some
+            old = {cell: await weather_cache.aget_stale(f"{cell[0]}|{cell[1]}") for cell in missing}
+            if any(v is None for v in old.values()):
+                return {"error": "Weather unavailable", "status": e.status}
+            STALE_SERVED.labels("weather_cells").inc(len(old))
+            current.update(old)
+            stale = True
+        else:
+            # a single location comes back as an object, several as a list
+            results = resp if isinstance(resp, list) else [resp]
+            if len(results) != len(missing) or any("current" not in r for r in results):
+                return {"error": "Weather lookup failed", "raw": resp}
+            for cell, result in zip(missing, results):
+                current[cell] = result["current"]
+                await weather_cache.aset(f"{cell[0]}|{cell[1]}", result["current"])
+
+    result = {
+        "waypoints": [
+            {"lat": round(lat, 5), "lng": round(lng, 5), **current[cell]}
+            for (lat, lng), cell in zip(points.tolist(), cells)
+        ]
+    }
+    if stale:
+        result["stale"] = True
+    return result
+
+
+# -----------------------------------------------------
+#  13. Full Trip Plan (server-side pipeline)
+# -----------------------------------------------------
+# The whole PROMPT_1 workflow as one tool call: the LLM spends one turn
+# requesting it and one narrating the result, instead of a turn per step.
+# Independent branches run concurrently; only fuel waits on the route.
+# A failing branch becomes {"error": ...} in its slot, the rest still ship.
+FULL_TRIP_TOP_K = 5
+
+
+def _branch(result):
+    if isinstance(result, BaseException):
+        return {"error": f"{type(result).__name__}: {result}"}
+    return result
+
+
+def _weather_summary(weather: dict) -> dict:
+    if "waypoints" not in weather:
+        return weather
+    temps = [w["temperature_2m"] for w in weather["waypoints"] if "temperature_2m" in w]
+    return {
+        "waypoints": len(weather["waypoints"]),
+        "min_temp_c": min(temps, default=None),
+        "max_temp_c": max(temps, default=None),
+        "weather_codes": sorted({w["weather_code"] for w in weather["waypoints"] if "weather_code" in w}),
+    }
+
+
+@app.tool()
+@instrument_tool
+@trace_tool
+async def plan_full_trip(input: dict):
+    print("planning the whole trip...")
+    origin = input["origin"]
+    destination = input["destination"]
+    days = input.get("days", 2)
+    top_k = input.get("top_k", FULL_TRIP_TOP_K)
+
+    mood = analyze_roadtrip_mood.fn({"mood": input.get("mood", "")})
+    od = {"origin": origin, "destination": destination}
+
+    route, scenic, food, weather, media = await asyncio.gather(
+        plan_route.fn(od),
+        find_stops_along_route.fn({**od, "kind": "scenic", "top_k": top_k}),
+        find_stops_along_route.fn({**od, "kind": "food", "top_k": top_k}),
+        get_weather_along_route.fn(od),
+        # optional: yields to the other branches for rate limit and CSE quota
+        in_background(generate_trip_media.fn({"destination": destination, "style": input.get("style", "cinematic")})),
+        return_exceptions=True,
+    )
+    route, scenic, food, media = map(_branch, (route, scenic, food, media))
+    weather = _weather_summary(_branch(weather))
+
+    if "distance_km" in route:
+        fuel = estimate_fuel_cost.fn({
+            "distance_km": route["distance_km"],
+            "mileage_kmpl": input.get("mileage_kmpl", 18),
+            "fuel_price": input.get("fuel_price", 110),
+        })
+    else:
+        fuel = {"error": "No route, fuel not estimated"}
+
+    itinerary = generate_roadtrip_itinerary.fn({
+        "destination": destination,
+        "days": days,
+        "vibe": mood["vibes"][0],
+    })
+    context = enhance_destination_context.fn({"destination": destination})
+
+    return {
+        "mood": mood,
+        "route": route,
+        "fuel": fuel,
+        "weather": weather,
+        # stop lists, or the branch's {"error": ...}
+        "scenic_spots": scenic.get("stops", scenic),
+        "food_stops": food.get("stops", food),
+        "itinerary": itinerary["itinerary"],
+        "preview_image": media.get("ai_generated_preview"),
+        "real_images": media.get("real_images", [])[:1],
+        "extra_context": context,
+    }
+
+
+# -----------------------------------------------------
+#  Tool manifest (cached by the agent, see mcp_manifest.py)
+# -----------------------------------------------------
+# The schema hash is the manifest's version: clients send the hash they
+# hold as If-None-Match and only download the tool list when it changed.
+_manifest = None
+
+
+async def tool_manifest() -> dict:
+    global _manifest
+    if _manifest is None:
+        tools = await app.get_tools()
+        listed = [
+            tool.to_mcp_tool(name=name).model_dump(mode="json", exclude_none=True)
+            for name, tool in sorted(tools.items())
+        ]
+        digest = hashlib.sha256(json.dumps(listed, sort_keys=True).encode()).hexdigest()
+        _manifest = {"schema_hash": digest, "tools": listed}
+    return _manifest
+
+
+@app.custom_route("/manifest", methods=["GET"])
+async def manifest_endpoint(request):
+    manifest = await tool_manifest()
+    etag = f'"{manifest["schema_hash"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(manifest, headers={"ETag": etag})
+
+
 async def main():
     await app.run_async(transport="http", port=5003)
 
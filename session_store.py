@@ -0,0 +1,325 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+# -----------------------------------------------------
+#  Durable session store (SQLite, WAL)
+# -----------------------------------------------------
+# Drop-in replacement for InMemorySessionService:
+#   - sessions are keyed (and indexed) by (app_name, user_id, session_id),
+#     so any worker pointing at the same file can resume a conversation
+#   - events are only ever INSERTed, one row each
+#   - get_session loads just the most recent SESSION_EVENT_WINDOW events
+#     unless the caller asks otherwise, so worker memory stays flat no
+#     matter how long a conversation gets
+#   - every SESSION_COMPACT_EVERY appends, old events beyond
+#     SESSION_MAX_EVENTS per session and sessions idle longer than
+#     SESSION_RETENTION_DAYS are deleted
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", ".cache/sessions.sqlite3")
+SESSION_EVENT_WINDOW = int(os.getenv("SESSION_EVENT_WINDOW", "200"))
+SESSION_MAX_EVENTS = int(os.getenv("SESSION_MAX_EVENTS", "1000"))
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "30"))
+SESSION_COMPACT_EVERY = int(os.getenv("SESSION_COMPACT_EVERY", "500"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_idle ON sessions (last_update_time);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (app_name, user_id, session_id, seq);
+CREATE TABLE IF NOT EXISTS app_state (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+
+def _split_state(state: Optional[dict]) -> tuple[dict, dict, dict]:
+    """app:/user:/session-scoped parts of a state dict; temp: is dropped."""
+    app, user, session = {}, {}, {}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app[key.removeprefix(State.APP_PREFIX)] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key.removeprefix(State.USER_PREFIX)] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+class SqliteSessionService(BaseSessionService):
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._appends = 0
+
+    # sqlite calls are short but still blocking: keep them off the loop
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE: take the write lock up front instead of failing halfway
+        # through when another worker holds it. A failed statement rolls
+        # back, so the shared connection is never left inside a transaction.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # ---------------- shared state ----------------
+
+    def _merge_state(self, app_name: str, user_id: str, state: dict) -> dict:
+        row = self._conn.execute(
+            "SELECT state FROM app_state WHERE app_name = ?", (app_name,)
+        ).fetchone()
+        for key, value in json.loads(row[0]).items() if row else ():
+            state[State.APP_PREFIX + key] = value
+        row = self._conn.execute(
+            "SELECT state FROM user_state WHERE app_name = ? AND user_id = ?",
+            (app_name, user_id),
+        ).fetchone()
+        for key, value in json.loads(row[0]).items() if row else ():
+            state[State.USER_PREFIX + key] = value
+        return state
+
+    def _update_shared(self, app_name: str, user_id: str, app: dict, user: dict):
+        if app:
+            row = self._conn.execute(
+                "SELECT state FROM app_state WHERE app_name = ?", (app_name,)
+            ).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **app}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO app_state VALUES (?, ?)",
+                (app_name, json.dumps(merged)),
+            )
+        if user:
+            row = self._conn.execute(
+                "SELECT state FROM user_state WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id),
+            ).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **user}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_state VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(merged)),
+            )
+
+    # ---------------- sessions ----------------
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        return await self._run(self._create, app_name, user_id, state, session_id)
+
+    def _create(self, app_name, user_id, state, session_id) -> Session:
+        app, user, session_state = _split_state(state)
+        now = time.time()
+        try:
+            with self._transaction():
+                self._conn.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)",
+                    (app_name, user_id, session_id, json.dumps(session_state), now),
+                )
+                self._update_shared(app_name, user_id, app, user)
+        except sqlite3.IntegrityError:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=self._merge_state(app_name, user_id, session_state),
+            last_update_time=now,
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return await self._run(self._get, app_name, user_id, session_id, config)
+
+    def _get(self, app_name, user_id, session_id, config) -> Optional[Session]:
+        row = self._conn.execute(
+            "SELECT state, last_update_time FROM sessions"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (app_name, user_id, session_id),
+        ).fetchone()
+        if row is None:
+            return None
+
+        limit = SESSION_EVENT_WINDOW
+        after = 0.0
+        if config:
+            limit = config.num_recent_events or limit
+            after = config.after_timestamp or after
+        # newest first with a LIMIT, so only the window is ever read
+        rows = self._conn.execute(
+            "SELECT event FROM events"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ? AND timestamp >= ?"
+            " ORDER BY seq DESC LIMIT ?",
+            (app_name, user_id, session_id, after, limit),
+        ).fetchall()
+
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=self._merge_state(app_name, user_id, json.loads(row[0])),
+            events=[Event.model_validate_json(r[0]) for r in reversed(rows)],
+            last_update_time=row[1],
+        )
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        return await self._run(self._list, app_name, user_id)
+
+    def _list(self, app_name, user_id) -> ListSessionsResponse:
+        if user_id is None:
+            rows = self._conn.execute(
+                "SELECT user_id, session_id, state, last_update_time FROM sessions WHERE app_name = ?",
+                (app_name,),
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                "SELECT user_id, session_id, state, last_update_time FROM sessions"
+                " WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id),
+            ).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(
+                app_name=app_name,
+                user_id=uid,
+                id=sid,
+                state=self._merge_state(app_name, uid, json.loads(state)),
+                last_update_time=updated,
+            )
+            for uid, sid, state, updated in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self._run(self._delete, app_name, user_id, session_id)
+
+    def _delete(self, app_name, user_id, session_id):
+        key = (app_name, user_id, session_id)
+        with self._transaction():
+            self._conn.execute(
+                "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+
+    # ---------------- events ----------------
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # updates session.state / session.events on the caller's copy
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        await self._run(self._append, session, event)
+        return event
+
+    def _append(self, session: Session, event: Event):
+        app, user, _ = _split_state(event.actions.state_delta if event.actions else None)
+        _, _, session_state = _split_state(session.state)
+        key = (session.app_name, session.user_id, session.id)
+        with self._transaction():
+            self._conn.execute(
+                "INSERT INTO events (app_name, user_id, session_id, timestamp, event)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*key, event.timestamp, event.model_dump_json(exclude_none=True)),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET state = ?, last_update_time = ?"
+                " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (json.dumps(session_state), event.timestamp, *key),
+            )
+            self._update_shared(session.app_name, session.user_id, app, user)
+
+        self._appends += 1
+        if self._appends % SESSION_COMPACT_EVERY == 0:
+            self._compact()
+
+    # ---------------- retention ----------------
+
+    def _compact(self):
+        cutoff = time.time() - SESSION_RETENTION_DAYS * 86400
+        with self._transaction():
+            self._conn.execute(
+                "DELETE FROM events WHERE (app_name, user_id, session_id) IN ("
+                " SELECT app_name, user_id, session_id FROM sessions WHERE last_update_time < ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE last_update_time < ?", (cutoff,))
+            # keep only the newest SESSION_MAX_EVENTS rows of every session
+            self._conn.execute(
+                "DELETE FROM events WHERE seq IN ("
+                " SELECT seq FROM ("
+                "  SELECT seq, ROW_NUMBER() OVER ("
+                "   PARTITION BY app_name, user_id, session_id ORDER BY seq DESC) AS rn"
+                "  FROM events)"
+                " WHERE rn > ?)",
+                (SESSION_MAX_EVENTS,),
+            )
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def compact(self):
+        await self._run(self._compact)
+
+    async def close(self):
+        await self._run(self._conn.close)
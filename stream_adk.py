@@ -1,70 +1,198 @@
+import os
+import sys
+import time
+
+from google.adk.events.event import Event
+
+# -----------------------------------------------------
+#  ADK event -> typed stream events
+# -----------------------------------------------------
+# Called once per streamed token, so it does one pass over the content
+# parts and reads the Event fields directly (no hasattr probing). The
+# common shape, a partial event carrying one text delta, returns right
+# after that pass. Results are StreamEvent records with __slots__ rather
+# than fresh dicts; to_dict() builds the wire form only when serialising.
+
+TEXT = "text"
+TOOL_CALL = "tool_call"
+TOOL_RESULT = "tool_result"
+FINAL = "final"
+FINISH = "finish"
+ERROR = "error"
+INTERRUPTED = "interrupted"
+GROUNDING = "grounding"
+BRANCH = "branch"
+CUSTOM = "custom"
+# emitted by agent.stream_roadtrip_prompt from the parsed answer
+SECTION = "section"
+DOCUMENT = "document"
+DONE = "done"
+
+# wire name of StreamEvent.value for each type; unlisted types carry no value
+_VALUE_KEYS = {
+    TEXT: "value",
+    TOOL_CALL: "arguments",
+    TOOL_RESULT: "response",
+    FINISH: "reason",
+    ERROR: "error_message",
+    GROUNDING: "value",
+    BRANCH: "value",
+    CUSTOM: "value",
+    SECTION: "value",
+    DOCUMENT: "value",
+    DONE: "session_id",
+}
+
+_NAME_KEYS = {ERROR: "error_code", SECTION: "path"}
+
+
+class StreamEvent:
+    __slots__ = ("type", "value", "id", "name", "partial")
+
+    def __init__(self, type: str, value=None, id=None, name=None, partial: bool = False):
+        self.type = type
+        self.value = value
+        self.id = id
+        self.name = name
+        self.partial = partial
+
+    def to_dict(self) -> dict:
+        out = {"type": self.type}
+        if self.type == TEXT:
+            out["partial"] = self.partial
+        if self.id is not None:
+            out["id"] = self.id
+        if self.name is not None:
+            out[_NAME_KEYS.get(self.type, "name")] = self.name
+        key = _VALUE_KEYS.get(self.type)
+        if key is not None and self.value is not None:
+            out[key] = self.value
+        return out
+
+    def __repr__(self):
+        return f"StreamEvent({self.to_dict()!r})"
+
+
+def classify_event(event: Event) -> list[StreamEvent]:
+    out = []
+    partial = bool(event.partial)
+    has_calls = False
+    trailing_code_result = False
+
+    content = event.content
+    if content is not None and content.parts:
+        for part in content.parts:
+            text = part.text
+            if text:
+                # thought parts are the model's reasoning, not the answer
+                if not part.thought:
+                    out.append(StreamEvent(TEXT, text, partial=partial))
+            elif part.function_call is not None:
+                call = part.function_call
+                out.append(StreamEvent(TOOL_CALL, call.args, call.id, call.name))
+                has_calls = True
+            elif part.function_response is not None:
+                response = part.function_response
+                out.append(StreamEvent(TOOL_RESULT, response.response, response.id, response.name))
+                has_calls = True
+        trailing_code_result = content.parts[-1].code_execution_result is not None
+
+    if partial and event.error_code is None:
+        # token deltas: nothing else on the event is set while streaming
+        return out
+
+    if event.grounding_metadata is not None:
+        out.append(StreamEvent(GROUNDING, event.grounding_metadata))
+    if event.branch:
+        out.append(StreamEvent(BRANCH, event.branch))
+    if event.finish_reason is not None:
+        out.append(StreamEvent(FINISH, event.finish_reason))
+    # same rules as Event.is_final_response(), without walking the parts again
+    actions = event.actions
+    if (
+        (actions is not None and actions.skip_summarization)
+        or event.long_running_tool_ids
+        or (not has_calls and not partial and not trailing_code_result)
+    ):
+        out.append(StreamEvent(FINAL))
+    if event.interrupted:
+        out.append(StreamEvent(INTERRUPTED))
+    if event.error_code:
+        out.append(StreamEvent(ERROR, event.error_message, name=event.error_code))
+    if event.custom_metadata:
+        out.append(StreamEvent(CUSTOM, event.custom_metadata))
+    return out
+
+
 async def classify_adk_event(event):
-    # TEXT DELTA
-    if event and hasattr(event, "content") and event.content and event.content.parts:
-        for part in event.content.parts:
-            if hasattr(part, "text") and part.text:
-                yield {"type": "text", "value": part.text}
-
-    # TOOL CALL (function_call)
-    if event and hasattr(event, "actions") and event.actions:
-        for action in event.actions:
-            if hasattr(action, "function_call") and action.function_call:
-                yield {
-                    "type": "tool_call",
-                    "name": action.function_call.name,
-                    "arguments": action.function_call.args,
-                }
-
-    # TOOL RESULT (function_response)
-    if event and hasattr(event, "actions") and event.actions:
-        for action in event.actions:
-            if hasattr(action, "function_response") and action.function_response:
-                yield {
-                    "type": "tool_result",
-                    "id": action.function_response.id,
-                    "response": action.function_response.response,
-                }
-
-    # # INPUT TRANSCRIPTION (Audio → Text)
-    # if event and hasattr(event, "input_transcription") and event.input_transcription:
-    #     for part in event.input_transcription.parts:
-    #         if hasattr(part, "text") and part.text:
-    #             yield {"type": "input_transcription", "value": part.text}
-
-    # # OUTPUT TRANSCRIPTION (Text → Audio transcript)
-    # if event and hasattr(event, "output_transcription") and event.output_transcription:
-    #     for part in event.output_transcription.parts:
-    #         if hasattr(part, "text") and part.text:
-    #             yield {"type": "output_transcription", "value": part.text}
-
-
-    # GROUNDING METADATA
-    if event and hasattr(event, "grounding_metadata") and event.grounding_metadata:
-        yield {"type": "grounding", "value": event.grounding_metadata}
-
-    # BRANCHING
-    if event and hasattr(event, "branch") and event.branch:
-        yield {"type": "branch", "value": event.branch}
-
-    # COMPLETION / FINALIZATION
-    if event and hasattr(event, "finish_reason") and event.finish_reason:
-        yield {"type": "finish", "reason": event.finish_reason}
-
-    if event and hasattr(event, "is_final_response") and event.is_final_response:
-        yield {"type": "final"}
-
-    # INTERRUPTED
-    if event and hasattr(event, "interrupted") and event.interrupted:
-        yield {"type": "interrupted"}
-
-    # ERROR
-    if event and hasattr(event, "error_code") and event.error_code:
-        yield {
-            "type": "error",
-            "error_code": event.error_code,
-            "error_message": event.error_message,
-        }
-
-    # CUSTOM METADATA (Your MCP logs, routing logs, etc.)
-    if event and hasattr(event, "custom_metadata") and event.custom_metadata:
-        yield {"type": "custom", "value": event.custom_metadata}
+    """Dict-yielding form of classify_event, kept for existing callers."""
+    if event is None:
+        return
+    for item in classify_event(event):
+        yield item.to_dict()
+
+
+# -----------------------------------------------------
+#  Answer text of a run + console echo
+# -----------------------------------------------------
+# Deltas go into a list and are joined once (no quadratic +=). A closing
+# non-partial text event repeats the deltas of its response in full, so it
+# replaces them instead of being appended a second time.
+
+CONSOLE_FLUSH_INTERVAL = float(os.getenv("CONSOLE_FLUSH_INTERVAL", "0.05"))
+
+
+class ConsoleSink:
+    """Buffers echoed text; one write + flush per interval, not per token."""
+
+    def __init__(self, stream=None, interval: float = CONSOLE_FLUSH_INTERVAL):
+        self._stream = stream or sys.stdout
+        self._interval = interval
+        self._buffer = []
+        self._flushed_at = 0.0
+
+    def write(self, text: str):
+        self._buffer.append(text)
+        now = time.monotonic()
+        if now - self._flushed_at >= self._interval:
+            self.flush(now)
+
+    def flush(self, now: float | None = None):
+        if self._buffer:
+            self._stream.write("".join(self._buffer))
+            self._stream.flush()
+            self._buffer.clear()
+        self._flushed_at = time.monotonic() if now is None else now
+
+
+class ResponseAccumulator:
+    def __init__(self, sink: ConsoleSink | None = None):
+        self._sink = sink
+        self._done = []      # text of finished responses
+        self._pending = []   # deltas of the response being streamed
+
+    def add(self, item: StreamEvent):
+        if item.type != TEXT:
+            return
+        if item.partial:
+            self._pending.append(item.value)
+            if self._sink:
+                self._sink.write(item.value)
+            return
+
+        streamed = "".join(self._pending)
+        self._pending.clear()
+        self._done.append(item.value)
+        if self._sink:
+            # only what the deltas did not already show
+            rest = item.value[len(streamed):] if item.value.startswith(streamed) else item.value
+            if rest:
+                self._sink.write(rest)
+
+    def text(self) -> str:
+        return "".join(self._done) + "".join(self._pending)
+
+    def close(self) -> str:
+        if self._sink:
+            self._sink.flush()
+        return self.text()
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.sessions import Session
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.tool_context import ToolContext
+
+from cache import LRUCache
+from tracing import inject_trace
+
+# -----------------------------------------------------
+#  Tool-call memoization (agent side)
+# -----------------------------------------------------
+# Within one plan the model regularly repeats a call it already made:
+# plan_route for the same origin/destination, analyze_roadtrip_mood for
+# the same mood ... Every tool call goes through this wrapper, keyed by
+#   app name + user id + session id + tool name + canonical JSON of the arguments
+# so a repeat inside the same session is answered from memory for
+# TOOL_MEMO_TTL seconds, and identical calls that are in flight at the
+# same time share one MCP round-trip (single-flight).
+# Error results are never memoized, so a retry really retries.
+#
+# ADK already runs the function calls of one model turn as concurrent
+# tasks and merges their responses in call order; the wrapper caps how
+# many of them one agent invocation has in flight over the MCP sessions
+# at once (TOOL_MAX_CONCURRENCY), so a model fanning out a dozen calls
+# cannot swamp the server or the upstream quotas. The limit is per
+# invocation, not per process: one prompt's fan-out never makes another
+# user's tool calls wait.
+
+TOOL_MEMO_TTL = float(os.getenv("TOOL_MEMO_TTL", "600"))
+TOOL_MEMO_SIZE = int(os.getenv("TOOL_MEMO_SIZE", "4096"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))
+
+
+def call_key(session: Session, tool_name: str, args: dict) -> str:
+    # session ids are only unique per (app, user): the memo is shared by all
+    canonical = json.dumps(
+        [session.app_name, session.user_id, session.id, tool_name, args],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _is_error(result: Any) -> bool:
+    # MCP CallToolResult dumps carry isError; our tools also return {"error": ...}
+    if not isinstance(result, dict):
+        return False
+    if result.get("isError") or "error" in result:
+        return True
+    structured = result.get("structuredContent")
+    return isinstance(structured, dict) and "error" in structured
+
+
+class ToolCallMemo:
+    def __init__(self, maxsize: int = TOOL_MEMO_SIZE, ttl: float = TOOL_MEMO_TTL):
+        self._results = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.executed = 0
+        self.memo_hits = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, call):
+        """Result of `call()` for this key, running it at most once at a time."""
+        self.calls += 1
+        result = self._results.get(key)
+        if result is not None:
+            self.memo_hits += 1
+            return result
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            # shield: a cancelled follower must not cancel the leader's call
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await call()
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if result is not None and not _is_error(result):
+                self._results.set(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        saved = self.memo_hits + self.coalesced
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "saved": saved,
+            "memo_hits": self.memo_hits,
+            "coalesced": self.coalesced,
+            "saved_ratio": saved / self.calls if self.calls else 0.0,
+            "entries": len(self._results),
+        }
+
+
+class InvocationLimits:
+    """A concurrency limit per agent invocation, dropped once its calls are done."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        # invocation id -> [semaphore, calls holding or waiting for it]
+        self._limits: dict[str, list] = {}
+
+    @asynccontextmanager
+    async def slot(self, invocation_id: str):
+        entry = self._limits.get(invocation_id)
+        if entry is None:
+            entry = self._limits[invocation_id] = [asyncio.Semaphore(self.limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._limits[invocation_id]
+
+    def __len__(self) -> int:
+        return len(self._limits)
+
+
+class _MemoizedTool(BaseTool):
+    """Same declaration as the wrapped tool; calls go through the memo."""
+
+    def __init__(self, tool: BaseTool, memo: ToolCallMemo, limits: InvocationLimits):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            is_long_running=tool.is_long_running,
+            custom_metadata=tool.custom_metadata,
+        )
+        self._tool = tool
+        self._memo = memo
+        self._limits = limits
+
+    def _get_declaration(self):
+        return self._tool._get_declaration()
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        key = call_key(tool_context.session, self.name, args)
+
+        async def call():
+            # only the call that actually goes out takes a slot
+            async with self._limits.slot(tool_context.invocation_id):
+                # the key above is computed without the trace context
+                return await self._tool.run_async(args=inject_trace(args), tool_context=tool_context)
+
+        return await self._memo.run(key, call)
+
+
+class MemoizedToolset(BaseToolset):
+    def __init__(
+        self,
+        toolset: BaseToolset,
+        memo: Optional[ToolCallMemo] = None,
+        max_concurrency: int = TOOL_MAX_CONCURRENCY,
+    ):
+        super().__init__()
+        self._toolset = toolset
+        self.memo = memo or ToolCallMemo()
+        self.max_concurrency = max(max_concurrency, 1)
+        self._limits = InvocationLimits(self.max_concurrency)
+
+    async def get_tools(
+        self,
+        readonly_context: Optional[ReadonlyContext] = None,
+    ) -> list[BaseTool]:
+        tools = await self._toolset.get_tools(readonly_context)
+        return [_MemoizedTool(tool, self.memo, self._limits) for tool in tools]
+
+    async def close(self) -> None:
+        await self._toolset.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.memo.stats(),
+            "max_concurrency": self.max_concurrency,
+            "active_invocations": len(self._limits),
+        }
@@ -0,0 +1,178 @@
+import functools
+import inspect
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+# -----------------------------------------------------
+#  Distributed tracing (OpenTelemetry)
+# -----------------------------------------------------
+# One trace per prompt, end to end:
+#
+#   roadtrip.prompt                       agent.stream_roadtrip_prompt
+#     invoke_agent / call_llm             ADK, one per LLM turn
+#     execute_tool plan_route             ADK, one per tool call
+#       tool plan_route                   server.py (@trace_tool)
+#         GET maps                        upstream.get_json
+#
+# The MCP sessions are pooled and shared, so the trace context cannot
+# ride on HTTP headers: the agent puts a W3C traceparent into the tool
+# input as "_trace" (tool_memo.py) and @trace_tool pops it before the
+# tool body runs.
+#
+#   TRACE_EXPORTER      none (default) | file | otlp | console
+#   TRACE_FILE          file exporter: one JSON span per line
+#   TRACE_SAMPLE_RATIO  share of prompts traced (default 0.01); the MCP
+#                       server follows the agent's decision
+# Spans are exported in batches from a background thread. Unsampled
+# prompts only pay for non-recording spans and the traceparent, ~40us per
+# tool call: lost in the noise (<1%) next to an upstream request, ~15% of
+# a tool that never leaves the process (benchmarks/tracing_overhead.py).
+# OTLP uses the standard OTEL_EXPORTER_OTLP_* variables.
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", ".traces/spans.jsonl")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.01"))
+
+TRACE_KEY = "_trace"
+# traceparent only: no baggage rides along with the tool input
+_propagator = TraceContextTextMapPropagator()
+
+tracer = trace.get_tracer("roadtrip")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        self._file.close()
+
+
+def _exporter(kind: str) -> SpanExporter:
+    if kind == "file":
+        return JsonLinesSpanExporter(TRACE_FILE)
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    raise ValueError(f"Unknown TRACE_EXPORTER: {kind}")
+
+
+_provider: TracerProvider | None = None
+
+
+def setup_tracing(service_name: str, exporter: str | None = None, ratio: float | None = None):
+    """Installs the global tracer provider once; TRACE_EXPORTER=none leaves tracing off."""
+    global _provider
+    exporter = exporter or TRACE_EXPORTER
+    if _provider is not None or exporter == "none":
+        return
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO if ratio is None else ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_exporter(exporter)))
+    trace.set_tracer_provider(_provider)
+
+
+def shutdown_tracing():
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+# ---------------- agent -> MCP server ----------------
+
+def inject_trace(args: dict[str, Any]) -> dict[str, Any]:
+    """Copy of the tool args with the current trace context in input._trace."""
+    if not trace.get_current_span().get_span_context().is_valid:
+        return args
+    tool_input = args.get("input")
+    if not isinstance(tool_input, dict):
+        return args
+    carrier: dict[str, str] = {}
+    _propagator.inject(carrier)
+    return {**args, "input": {**tool_input, TRACE_KEY: carrier}}
+
+
+def _start_tool_span(name: str, args: tuple, kwargs: dict):
+    tool_input = kwargs.get("input", args[0] if args else None)
+    carrier = tool_input.pop(TRACE_KEY, None) if isinstance(tool_input, dict) else None
+    parent = _propagator.extract(carrier) if carrier else None
+    return tracer.start_as_current_span(f"tool {name}", context=parent, kind=SpanKind.SERVER)
+
+
+def _end_tool_span(span, result):
+    if isinstance(result, dict) and "error" in result:
+        span.set_status(Status(StatusCode.ERROR, str(result["error"])))
+
+
+def trace_tool(fn):
+    """
+    Span per tool call, parented to the agent's execute_tool span when the
+    input carries _trace. Goes under @app.tool() / @instrument_tool.
+    """
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _start_tool_span(name, args, kwargs) as span:
+                result = await fn(*args, **kwargs)
+                _end_tool_span(span, result)
+                return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _start_tool_span(name, args, kwargs) as span:
+                result = fn(*args, **kwargs)
+                _end_tool_span(span, result)
+                return result
+    return wrapper
+
+
+# ---------------- upstream HTTP ----------------
+
+@contextmanager
+def upstream_span(upstream: str, method: str, url: str):
+    """
+    Client span for one upstream request. Only scheme/host/path are
+    recorded: the query carries API keys.
+    """
+    with tracer.start_as_current_span(f"{method} {upstream}", kind=SpanKind.CLIENT) as span:
+        if span.is_recording():
+            span.set_attribute("http.request.method", method)
+            span.set_attribute("url.full", url)
+            span.set_attribute("roadtrip.upstream", upstream)
+        yield span
+
+
+def set_status_code(span, status_code: int):
+    if span.is_recording():
+        span.set_attribute("http.response.status_code", status_code)
+        if status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
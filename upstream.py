@@ -0,0 +1,126 @@
+import os
+import httpx
+
+from metrics import track_upstream
+from tracing import upstream_span, set_status_code
+from ratelimit import limiter
+from resilience import policy
+
+# -----------------------------------------------------
+#  Upstream APIs used by the MCP tools
+# -----------------------------------------------------
+# Each upstream gets its own timeout: Directions / Places are paid and
+# normally answer well under a second, Open-Meteo is free but slower,
+# CSE is optional so we never let it hold a tool call for long.
+#
+# Base URLs can be injected from the environment, e.g. to point the
+# server at benchmarks/stub_upstream.py:
+#   UPSTREAM_BASE_URL=http://127.0.0.1:5099     every upstream
+#   MAPS_BASE_URL=... / WEATHER_BASE_URL=... / CSE_BASE_URL=...
+#   POLLINATIONS_BASE_URL=...                  only used to build links
+#
+# "qps" is the client-side rate limit (ratelimit.py), overridable with
+# MAPS_QPS / WEATHER_QPS / CSE_QPS (0 = no limit): Maps' default
+# per-minute quotas, Open-Meteo's free 600 calls / minute, CSE's 100
+# queries / minute.
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL")
+
+
+def _base_url(name: str, default: str) -> str:
+    return os.getenv(f"{name.upper()}_BASE_URL") or UPSTREAM_BASE_URL or default
+
+
+def _qps(name: str, default: float) -> float:
+    return float(os.getenv(f"{name.upper()}_QPS", str(default)))
+
+
+UPSTREAMS = {
+    "maps": {
+        "base_url": _base_url("maps", "https://maps.googleapis.com"),
+        "timeout": httpx.Timeout(10.0, connect=3.0),
+        "qps": _qps("maps", 50),
+    },
+    "weather": {
+        "base_url": _base_url("weather", "https://api.open-meteo.com"),
+        "timeout": httpx.Timeout(8.0, connect=3.0),
+        "qps": _qps("weather", 10),
+    },
+    "cse": {
+        "base_url": _base_url("cse", "https://www.googleapis.com"),
+        "timeout": httpx.Timeout(10.0, connect=3.0),
+        "qps": _qps("cse", 1.5),
+    },
+    # never fetched by the server: the client loads the generated image
+    "pollinations": {
+        "base_url": _base_url("pollinations", "https://image.pollinations.ai"),
+        "timeout": httpx.Timeout(30.0, connect=3.0),
+    },
+}
+
+
+def point_upstreams_at(base_url: str):
+    """Redirects every upstream to one base URL (a local stub, no rate limit)."""
+    for conf in UPSTREAMS.values():
+        conf["base_url"] = base_url
+        conf["qps"] = 0
+
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+
+# -----------------------------------------------------
+#  Shared AsyncClient
+# -----------------------------------------------------
+# One client per server process so every tool call reuses pooled
+# keep-alive (HTTP/2 where the upstream supports it) connections
+# instead of paying a TCP+TLS handshake per request.
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(http2=True, limits=POOL_LIMITS)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _retry_after(resp: httpx.Response, default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except ValueError:
+        # the HTTP-date form: not worth parsing, back off by the default
+        return default
+
+
+async def get_json(upstream: str, path: str, params: dict) -> dict:
+    """
+    JSON body of GET base_url + path. Rate limited per upstream, retried /
+    hedged / short-circuited by resilience.policy; raises UpstreamError
+    when the upstream is down or the rate-limit queue is too long.
+    """
+    conf = UPSTREAMS[upstream]
+    url = conf["base_url"] + path
+    rl = limiter(upstream, conf["qps"])
+
+    async def attempt() -> httpx.Response:
+        await rl.acquire()
+        with upstream_span(upstream, "GET", url) as span, track_upstream(upstream) as call:
+            resp = await get_client().get(url, params=params, timeout=conf["timeout"])
+            call.status = resp.status_code
+            set_status_code(span, resp.status_code)
+        if resp.status_code == 429:
+            await rl.pause(_retry_after(resp))
+        return resp
+
+    resp = await policy.call(upstream, attempt)
+    return resp.json()